@@ -28,16 +28,16 @@ class SARBaseAgent(AssistantAgent):
             "deployment_name": os.getenv("DEPLOYMENT_NAME")
         }]
 
-@abstractmethod
-def process_request(self, message):
-    """Process incoming requests - must be implemented by specific agents"""
-    pass
+    @abstractmethod
+    def process_request(self, message):
+        """Process incoming requests - must be implemented by specific agents"""
+        pass
 
-def update_status(self, status):
-    """Update agent's mission status"""
-    self.mission_status = status
-    return {"status": "updated", "new_status": status}
+    def update_status(self, status):
+        """Update agent's mission status"""
+        self.mission_status = status
+        return {"status": "updated", "new_status": status}
 
-def get_status(self):
-    """Return current status"""
-    return self.mission_status
\ No newline at end of file
+    def get_status(self):
+        """Return current status"""
+        return self.mission_status
\ No newline at end of file
@@ -0,0 +1,193 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from sar_project.config import settings
+from sar_project.instrumentation import registry, span
+
+FAST_PATH_METRIC = "sar_fast_path_total"
+
+
+class Intent:
+    __slots__ = ("name", "examples", "query", "template")
+
+    def __init__(self, name, examples, query, template):
+        """
+        A standard protocol question that can be answered without the LLM.
+
+        Args:
+            name (str): Identifier used in metrics.
+            examples (list): Phrasings of the question, embedded once to classify messages.
+            query (str): Question used to retrieve the supporting passage from the knowledge base.
+            template (str): Curated answer shown before the retrieved passage.
+        """
+        self.name = name
+        self.examples = examples
+        self.query = query
+        self.template = template
+
+
+INTENTS = [
+    Intent(
+        "cpr",
+        ["How do I do CPR?", "What is the compression rate for CPR?", "How deep should chest compressions be?",
+         "How many compressions to breaths in CPR?", "Steps for adult CPR"],
+        "adult CPR chest compression rate and depth",
+        "Adult CPR:\n"
+        "1. Call for help and send someone for an AED.\n"
+        "2. Push hard and fast in the centre of the chest: 100-120 compressions per minute, "
+        "at least 5 cm (2 in) deep but not more than 6 cm (2.4 in), letting the chest fully recoil.\n"
+        "3. If trained, give 2 rescue breaths after every 30 compressions; otherwise give continuous compressions.\n"
+        "4. Minimize pauses and use the AED as soon as it arrives.",
+    ),
+    Intent(
+        "tourniquet",
+        ["How do I apply a tourniquet?", "Where do I put a tourniquet?", "Tourniquet steps",
+         "How tight should a tourniquet be?"],
+        "how to apply a tourniquet",
+        "Tourniquet for life-threatening limb bleeding:\n"
+        "1. Place it 5-7 cm (2-3 in) above the wound, between the wound and the heart, not over a joint.\n"
+        "2. Tighten until the bleeding stops, then secure the windlass.\n"
+        "3. Note the time it was applied and do not loosen it.\n"
+        "4. Evacuate the patient to definitive care as a priority.",
+    ),
+    Intent(
+        "bleeding",
+        ["How do I stop severe bleeding?", "The wound won't stop bleeding", "How to control heavy bleeding",
+         "How do I pack a wound?"],
+        "control severe bleeding with direct pressure",
+        "Severe bleeding:\n"
+        "1. Apply firm, direct pressure with a clean dressing or cloth.\n"
+        "2. If blood soaks through, add more layers on top; do not remove the first dressing.\n"
+        "3. Pack deep wounds tightly with gauze and keep pressing.\n"
+        "4. For life-threatening bleeding from an arm or leg that pressure does not control, apply a tourniquet.",
+    ),
+    Intent(
+        "recovery_position",
+        ["How do I put someone in the recovery position?", "What is the recovery position?",
+         "Unconscious but breathing, how should I position them?"],
+        "recovery position for an unconscious breathing casualty",
+        "Recovery position (unresponsive but breathing normally):\n"
+        "1. Kneel beside them, place the near arm at a right angle and bring the far hand against the near cheek.\n"
+        "2. Bend the far knee and roll them towards you onto their side.\n"
+        "3. Tilt the head back to keep the airway open and keep checking their breathing.\n"
+        "4. If a spinal injury is suspected, keep the head and neck in line while rolling.",
+    ),
+    Intent(
+        "choking",
+        ["What do I do if someone is choking?", "How do I do the Heimlich maneuver?",
+         "Adult choking first aid", "Abdominal thrusts for choking"],
+        "first aid for a choking adult",
+        "Choking adult who cannot cough, speak or breathe:\n"
+        "1. Give up to 5 firm back blows between the shoulder blades.\n"
+        "2. Give up to 5 abdominal thrusts: fist above the navel, pull sharply inwards and upwards.\n"
+        "3. Repeat until the object comes out or the person becomes unresponsive.\n"
+        "4. If they become unresponsive, lower them to the ground and start CPR.",
+    ),
+    Intent(
+        "hypothermia",
+        ["How do I treat hypothermia?", "Patient is very cold and shivering", "How to rewarm someone",
+         "Signs of hypothermia"],
+        "treatment of hypothermia in the field",
+        "Hypothermia:\n"
+        "1. Get them out of the wind and wet, insulate them from the ground and handle them gently.\n"
+        "2. Replace wet clothing with dry layers and cover the head.\n"
+        "3. Rewarm the core (chest, armpits, groin) with warm packs; do not rub the limbs.\n"
+        "4. Give warm sweet drinks only if they are fully alert and able to swallow.",
+    ),
+    Intent(
+        "burns",
+        ["How do I treat a burn?", "First aid for burns", "Should I put ice on a burn?",
+         "How long should I cool a burn?"],
+        "first aid for burns cooling with water",
+        "Burns:\n"
+        "1. Cool the burn under cool running water for at least 20 minutes.\n"
+        "2. Remove jewellery and clothing near the burn unless stuck to it.\n"
+        "3. Cover loosely with cling film or a clean non-fluffy dressing.\n"
+        "4. Do not use ice, creams or butter, and do not burst blisters.",
+    ),
+]
+
+
+class FastPath:
+    def __init__(self, embedder, intents=INTENTS, threshold=0.75, margin=0.05, max_words=20):
+        """
+        Answers standard protocol questions locally instead of through Gemini.
+
+        All intent examples are embedded and normalized once, so classifying a message
+        costs one embedding and one small matrix-vector product.
+
+        Args:
+            embedder: Object with a SentenceTransformer-style encode().
+            intents (list): Intents to recognise.
+            threshold (float): Lowest cosine similarity accepted as a match.
+            margin (float): How far the best intent must lead the runner-up.
+            max_words (int): Longer messages describe a situation and always go to the LLM.
+        """
+        self.embedder = embedder
+        self.intents = intents
+        self.threshold = threshold
+        self.margin = margin
+        self.max_words = max_words
+        examples = [example for intent in intents for example in intent.examples]
+        self.owners = np.array([i for i, intent in enumerate(intents) for _ in intent.examples])
+        self.vectors = _normalize(embedder.encode(examples))
+
+    def classify(self, message):
+        """
+        Match a message to an intent.
+
+        Returns:
+            tuple: (intent, score), with intent None when no intent is confident enough.
+        """
+        if len(re.findall(r"\w+", message)) > self.max_words:
+            return None, 0.0
+        query = _normalize(self.embedder.encode([message]))[0]
+        scores = self.vectors @ query
+        per_intent = np.full(len(self.intents), -1.0)
+        np.maximum.at(per_intent, self.owners, scores)
+        ranked = np.argsort(per_intent)[::-1]
+        best = float(per_intent[ranked[0]])
+        runner_up = float(per_intent[ranked[1]]) if len(ranked) > 1 else -1.0
+        if best >= self.threshold and best - runner_up >= self.margin:
+            return self.intents[ranked[0]], best
+        return None, best
+
+    def answer(self, message, retrieve):
+        """
+        Answer a message locally if it is a confident protocol match.
+
+        Args:
+            message (str): The user's question.
+            retrieve (callable): Returns passages for a query. It is called on every hit,
+                so passages come from whichever source the caller has at the time, such
+                as a mission bundle loaded after the fast path was built.
+
+        Returns:
+            str: The answer, or None to fall through to the LLM.
+        """
+        with span("fast_path"):
+            intent, score = self.classify(message)
+            if intent is None:
+                registry.increment(FAST_PATH_METRIC, result="miss")
+                return None
+            passage = retrieve(intent.query)
+            registry.increment(FAST_PATH_METRIC, result="hit", intent=intent.name)
+            return (f"{intent.template}\n\nFrom the reference material:\n{passage}\n\n"
+                    "Ask a follow-up with your patient's details for guidance specific to them.")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+@lru_cache(maxsize=1)
+def default_fast_path():
+    """Fast path over the shared firstaid embedder, built once per process; None if disabled."""
+    if not settings.FAST_PATH:
+        return None
+    from sar_project.knowledge.knowledge_base_firstaid import embedder
+    return FastPath(embedder, threshold=settings.FAST_PATH_THRESHOLD)
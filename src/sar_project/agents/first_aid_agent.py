@@ -1,22 +1,32 @@
+import copy
+import heapq
 import os
 import requests
 from sar_project.agents.base_agent import SARBaseAgent
 import google.generativeai as genai
 from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+from sar_project.knowledge.road_network import default_road_graph
+from sar_project.agents.map_renderer import MapRenderer
+from sar_project.agents.mission_bundle import MissionBundle, default_bundle
+from sar_project.agents.fast_path import default_fast_path
 import json
 import re
+import threading
+import weakref
 import webbrowser
-import folium
-from folium.plugins import AntPath
 from math import radians, cos, sin, sqrt, atan2
 from dotenv import load_dotenv
+from sar_project.instrumentation import external_call, profiler, span
 load_dotenv()
 
 base = KnowledgeBase()
+# Only the hospitals closest in a straight line are compared by road travel time
+ROAD_RANKING_CANDIDATES = 10
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 class FirstAidAgent(SARBaseAgent):
-    def __init__(self, name="firstaid_specialist"):
+    def __init__(self, name="firstaid_specialist", knowledge_base=None, road_graph=None, bundle=None,
+                 fast_path=None):
         super().__init__(
             name=name,
             role="First-Aid Specialist",
@@ -26,34 +36,76 @@ class FirstAidAgent(SARBaseAgent):
             3. Provide recommendations on first aid based on #1 and #2
             4. Monitor changing conditions
             Respond as if you are talking to a SAR personnel, give them guidence on their question. Respond to their question not to the criteria above, just adhere to it.
-            User question: """
+            User question: """,
+            knowledge_base=knowledge_base if knowledge_base is not None else base
         )
+        # Offline road network for ranking hospitals by travel time; None falls back to straight-line distance
+        self.road_graph = road_graph if road_graph is not None else default_road_graph()
+        # Prefetched mission-area data answers hospital, weather and common protocol lookups offline
+        self.bundle = bundle if bundle is not None else default_bundle()
+        if self.road_graph is None and self.bundle is not None:
+            self.road_graph = self.bundle.road_graph()
+        # Answers standard protocol lookups locally; None sends every question to Gemini
+        self.fast_path = fast_path if fast_path is not None else default_fast_path()
+        # One MapRenderer per session state, shared with bound copies and dropped with the session
+        self._renderers = weakref.WeakKeyDictionary()
+        self._renderers_lock = threading.Lock()
+
+    def load_bundle(self, path):
+        """Use a mission bundle written by mission_bundle.build_bundle for offline lookups."""
+        self.bundle = MissionBundle(path)
+        if self.road_graph is None:
+            self.road_graph = self.bundle.road_graph()
+        return self.bundle
+
+    def bind(self, knowledge_base):
+        """Return a lightweight copy of this agent that works on another session's state."""
+        session_agent = copy.copy(self)
+        session_agent.kb = knowledge_base
+        return session_agent
 
     def process_request(self, message):
         """Process first-aid-related requests"""
         try:
-            prompt = self.generate_prompt(message)
-            return self.query_gemini(prompt)
+            with profiler.profile(getattr(self.kb, "session_id", None), "process_request"), \
+                    span("first_aid_request"):
+                answer = self.fast_answer(message)
+                if answer is not None:
+                    return answer
+                prompt = self.generate_prompt(message)
+                return self.query_gemini(prompt)
         except Exception as e:
             return {"error": str(e)}
 
+    def fast_answer(self, message):
+        """Answer a standard protocol question without Gemini, or return None if it is not one."""
+        if self.fast_path is None:
+            return None
+        return self.fast_path.answer(message, self.retrieve_relevant_text)
+
     def summarize_chat_history(self):
         """Summarize chat history to keep context without excessive length."""
         #Prompt Gemini to shorten the chat history to reduce prompt lengths
-        if len(base.chat_history) > 6:
+        if len(self.kb.chat_history) > 6:
             summary_prompt = (
                 "Summarize the following chat history while keeping all relevant first-aid and rescue details:\n\n"
-                f"{json.dumps(base.chat_history, indent=2)}"
+                f"{json.dumps(self.kb.chat_history, indent=2)}"
                 "\nReturn only a concise summary."
             )
             summary = self.query_gemini(summary_prompt)
-            base.chat_history = [summary]
+            self.kb.chat_history = [summary]
 
     def get_weather_conditions(self):
         """Fetch current weather from Open-Meteo API"""
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={base.lat}&longitude={base.lon}&current_weather=true"
-        response = requests.get(url)
-        data = response.json()
+        if self.bundle is not None and self.bundle.covers(float(self.kb.lat), float(self.kb.lon)):
+            weather = self.bundle.weather_at(float(self.kb.lat), float(self.kb.lon))
+            if weather is not None:
+                return weather
+
+        url = f"https://api.open-meteo.com/v1/forecast?latitude={self.kb.lat}&longitude={self.kb.lon}&current_weather=true"
+        with external_call("open_meteo"):
+            response = requests.get(url)
+            data = response.json()
 
         if "current_weather" in data:
             weather = data["current_weather"]
@@ -63,47 +115,77 @@ class FirstAidAgent(SARBaseAgent):
 
     def generate_prompt(self, message):
         """Generates a full prompt to send to Gemini"""
-        return (self.system_message +
-                message +
-                "\n Below is expert guidance, use it at your discretion to formulate your response: \n" +
-                base.retrieve_relevant_text(message) +
-                "\n Below is current weather conditions: \n" +
-                base.weather +
-                "\n Below is the closest hospital: \n" +
-                base.nearest_hospital +
-                "\n Take into account the rescuee and rescuer data (if any), as well as previous chat history (if any) below to maintain consistency." +
-                str(base.data) +
-                "Chat History: " + str(base.chat_history))
+        with span("prompt"):
+            return (self.system_message +
+                    message +
+                    "\n Below is expert guidance, use it at your discretion to formulate your response: \n" +
+                    self.retrieve_relevant_text(message) +
+                    "\n Below is current weather conditions: \n" +
+                    self.kb.weather +
+                    "\n Below is the closest hospital: \n" +
+                    self.kb.nearest_hospital +
+                    "\n Take into account the rescuee and rescuer data (if any), as well as previous chat history (if any) below to maintain consistency." +
+                    str(self.kb.data) +
+                    "Chat History: " + str(self.kb.chat_history))
+
+    def retrieve_relevant_text(self, message):
+        """Expert guidance for a message, from the mission bundle when it is a prefetched protocol question."""
+        if self.bundle is not None:
+            passages = self.bundle.cached_passages(message)
+            if passages is not None:
+                return passages
+        return self.kb.retrieve_relevant_text(message)
 
     def query_gemini(self, prompt, model="gemini-pro", max_tokens=None):
         """Query Google Gemini API and return response."""
         try:
-            response = genai.GenerativeModel(model).generate_content(prompt)
-            return response.text
+            with external_call("gemini"):
+                response = genai.GenerativeModel(model).generate_content(prompt)
+                return response.text
         except Exception as e:
             return f"Error: {e}"
 
+    def stream_gemini(self, prompt, model="gemini-pro"):
+        """Query Google Gemini API and yield the response text as it is generated."""
+        try:
+            with external_call("gemini_stream"):
+                response = genai.GenerativeModel(model).generate_content(prompt, stream=True)
+                for chunk in response:
+                    yield chunk.text
+        except Exception as e:
+            yield f"Error: {e}"
+
+    def update_location(self, lat, lon):
+        """Set the rescuer's coordinates and refresh the weather and nearest hospital for them."""
+        self.kb.lat = float(lat)
+        self.kb.lon = float(lon)
+        self.kb.weather = self.get_weather_conditions()
+        self.kb.nearest_hospital, self.kb.hospital_location = self.find_nearest_hospital()
+        return {"weather": self.kb.weather, "nearest_hospital": self.kb.nearest_hospital,
+                "hospital_location": self.kb.hospital_location}
+
     def update_user_data(self, message, lat, lon):
         # Prompt gemini to update the user data based on user message
         prompt = (
         "Update the following JSON data based on the user message. If there is no new relevant data, leave JSON as is. Never delete data, only add on."
         "Return only valid JSON without any extra text.\n\n"
         "Current JSON Data:\n"
-        f"{json.dumps(base.data, indent=2)}\n\n"
+        f"{json.dumps(self.kb.data, indent=2)}\n\n"
         "User Message:\n"
         f"{message}"
         )
 
         response = self.query_gemini(prompt)
-        previous_data = base.data
-        base.chat_history.append(message)
-        base.lat = float(lat)
-        base.lon = float(lon)
+        previous_data = self.kb.data
+        self.kb.chat_history.append(message)
+        if lat and lon:
+            self.kb.lat = float(lat)
+            self.kb.lon = float(lon)
 
         try:
-            base.data = json.loads(response)
+            self.kb.data = json.loads(response)
         except json.JSONDecodeError:
-            base.data = previous_data
+            self.kb.data = previous_data
             return
         except Exception as e:
             return f"Error: {e}"
@@ -111,22 +193,38 @@ class FirstAidAgent(SARBaseAgent):
 
     def get_nearest_hospital(self):
         """Find the nearest hospital using OpenStreetMap's Overpass API"""
+        return self.find_nearest_hospital()[0]
+
+    def find_nearest_hospital(self):
+        """
+        Like get_nearest_hospital, but also returns the hospital's (lat, lon), or None if
+        no hospital was found.
+        """
+        if self.bundle is not None and self.bundle.covers(float(self.kb.lat), float(self.kb.lon)):
+            hospitals = self.bundle.hospitals(float(self.kb.lat), float(self.kb.lon))
+            if hospitals:
+                return self._describe_nearest(hospitals)
+
         query = f"""
             [out:json][timeout:25];
-            nwr(around:100000,{base.lat},{base.lon})["amenity"="hospital"];
+            nwr(around:100000,{self.kb.lat},{self.kb.lon})["amenity"="hospital"];
             out center;
             """
 
         url = "https://overpass-api.de/api/interpreter"
-        response = requests.get(url, params={"data": query})
-        if response.status_code != 200:
-            return f"Error: Received status code {response.status_code}"
-
-        data = response.json()
+        try:
+            # Raise inside external_call so a failed lookup is counted as an error
+            with external_call("overpass"):
+                response = requests.get(url, params={"data": query})
+                if response.status_code != 200:
+                    raise requests.HTTPError(response=response)
+                data = response.json()
+        except requests.HTTPError as e:
+            return f"Error: Received status code {e.response.status_code}", None
 
         # If no hospitals are found, return
         if "elements" not in data or not data["elements"]:
-            return "No hospital found nearby."
+            return "No hospital found nearby.", None
 
         # Function to calculate distance
         def haversine(lat1, lon1, lat2, lon2):
@@ -152,68 +250,96 @@ class FirstAidAgent(SARBaseAgent):
                 continue
 
             if h_lat and h_lon:
-                distance = haversine(float(base.lat), float(base.lon), float(h_lat), float(h_lon))
+                distance = haversine(float(self.kb.lat), float(self.kb.lon), float(h_lat), float(h_lon))
                 name = hospital.get("tags", {}).get("name", "Unknown Hospital")
                 hospitals.append((name, h_lat, h_lon, distance))
 
+        return self._describe_nearest(hospitals)
+
+    def _describe_nearest(self, hospitals):
         # Sort hospitals by distance (ascending)
         hospitals.sort(key=lambda x: x[3])
 
+        if self.road_graph is not None:
+            # The straight-line nearest is often not the fastest by road in mountain terrain
+            candidates = heapq.nsmallest(ROAD_RANKING_CANDIDATES, hospitals, key=lambda x: x[3])
+            with span("road_ranking"):
+                travel_time, nearest_hospital = self.road_graph.rank_by_travel_time(
+                    float(self.kb.lat), float(self.kb.lon), candidates)[0]
+            if travel_time != float("inf"):
+                name, lat, lon, distance = nearest_hospital
+                return (f"{name}, Location: {lat}, {lon} (Distance: {distance:.2f} km, "
+                        f"Travel time: {travel_time / 60:.0f} min by road)"), (float(lat), float(lon))
+
         # Get the nearest hospital
         nearest_hospital = hospitals[0]
         name, lat, lon, distance = nearest_hospital
 
-        return f"{name}, Location: {lat}, {lon} (Distance: {distance:.2f} km)"
+        return f"{name}, Location: {lat}, {lon} (Distance: {distance:.2f} km)", (float(lat), float(lon))
 
     def extract_lat_lon(self):
         """Extract latitude and longitude from the hospital data string."""
         # Kind of ridiculous regex but it works
-        match = re.search(r"Location:\s*(-?\d+\.\d+),\s*(-?\d+\.\d+)", base.nearest_hospital)
+        match = re.search(r"Location:\s*(-?\d+\.\d+),\s*(-?\d+\.\d+)", self.kb.nearest_hospital)
         if match:
             lat, lon = map(float, match.groups())
             return lat, lon
         return None, None  # Return None if parsing fails
 
-    def generate_map(self):
+    def map_renderer(self):
+        """Return this session's MapRenderer, creating it on first use."""
+        template = self.bundle.map_template() if self.bundle is not None else None
+        with self._renderers_lock:
+            renderer = self._renderers.get(self.kb)
+            # A bundle loaded since the renderer was made brings its own page
+            if renderer is None or renderer._template is not template:
+                renderer = MapRenderer(template=template)
+                self._renderers[self.kb] = renderer
+            return renderer
+
+    def build_map(self, renderer=None):
+        """
+        Add the user's location, the nearest hospital and a path between them to a MapRenderer.
+
+        Without a renderer the session's own is updated, so only the layers that changed since
+        the last map are rebuilt.
+        """
+        with span("folium_build"):
+            if self.kb.hospital_location is None:
+                return None
+            hospital_lat, hospital_lon = self.kb.hospital_location
+
+            if renderer is None:
+                renderer = self.map_renderer()
+            user, hospital = (self.kb.lat, self.kb.lon), (hospital_lat, hospital_lon)
+            moved = (renderer.layers["rescuers"].get("user", ())[:2] != user
+                     or renderer.layers["hospitals"].get("nearest", ())[:2] != hospital
+                     or "hospital" not in renderer.layers["routes"])
+            renderer.add_marker("rescuers", "user", self.kb.lat, self.kb.lon,
+                                popup="Your Location", tooltip="You are here")
+            renderer.add_marker("hospitals", "nearest", hospital_lat, hospital_lon,
+                                popup=self.kb.nearest_hospital, tooltip="Click for details")
+            if moved:
+                path = None
+                if self.road_graph is not None:
+                    path = self.road_graph.route_coordinates(user, hospital)
+                renderer.add_route("hospital", path or [user, hospital])
+            return renderer
+
+    def generate_map(self, path="hospital_map.html", open_browser=True):
         """Generate a map with the nearest hospital and user's location marked, including a path between them."""
-        hospital_lat, hospital_lon = self.extract_lat_lon()
+        renderer = self.build_map()
 
-        if hospital_lat is None or hospital_lon is None:
-            print("Error: Could not extract coordinates from hospital data.")
+        if renderer is None:
+            print("Error: No hospital location to map.")
             return None
 
-        # Create a map centered at the midpoint between the user and the hospital
-        midpoint_lat = (base.lat + hospital_lat) / 2
-        midpoint_lon = (base.lon + hospital_lon) / 2
-        hospital_map = folium.Map(location=[midpoint_lat, midpoint_lon], zoom_start=12)
-
-        # Add a marker for the user's location
-        folium.Marker(
-            [base.lat, base.lon],
-            popup="Your Location",
-            tooltip="You are here",
-            icon=folium.Icon(color="blue", icon="home")
-        ).add_to(hospital_map)
-
-        # Add a marker for the hospital's location
-        folium.Marker(
-            [hospital_lat, hospital_lon],
-            popup="Nearest Hospital",
-            tooltip="Click for details",
-            icon=folium.Icon(color="red", icon="plus-sign")
-        ).add_to(hospital_map)
-
-        # Add a path between the two points
-        AntPath(
-            locations=[[base.lat, base.lon], [hospital_lat, hospital_lon]],
-            delay=1000, color="green", weight=4
-        ).add_to(hospital_map)
-
         # Save the map to an HTML file and open it
-        map_filename = "hospital_map.html"
-        hospital_map.save(map_filename)
+        with span("folium_save"):
+            map_filename = renderer.save(path)
         print(f"Map generated: {map_filename}")
-        webbrowser.open(map_filename)
+        if open_browser:
+            webbrowser.open(map_filename)
 
         return map_filename
 
@@ -234,15 +360,15 @@ if __name__ == "__main__":
         elif userInput.lower() == "make a map":
             agent.update_user_data(userInput, lat, lon)
             if lat and lon and i == 0:
-                base.weather = agent.get_weather_conditions()
-                base.nearest_hospital = agent.get_nearest_hospital()
+                agent.kb.weather = agent.get_weather_conditions()
+                agent.kb.nearest_hospital = agent.get_nearest_hospital()
                 i += 1
             agent.generate_map()
         else:
             agent.update_user_data(userInput, lat, lon)
             if lat and lon and i==0:
-                base.weather = agent.get_weather_conditions()
-                base.nearest_hospital = agent.get_nearest_hospital()
+                agent.kb.weather = agent.get_weather_conditions()
+                agent.kb.nearest_hospital = agent.get_nearest_hospital()
                 i+=1
 
             agent.summarize_chat_history()
@@ -0,0 +1,262 @@
+import html
+import json
+import os
+import threading
+from functools import lru_cache
+
+import folium
+from folium.plugins import AntPath, MarkerCluster
+
+from sar_project.instrumentation import span
+
+# Marker layers: icon colour and glyph, matching the markers generate_map has always drawn
+MARKER_STYLES = {
+    "rescuers": {"markerColor": "blue", "icon": "home"},
+    "patients": {"markerColor": "orange", "icon": "user"},
+    "hospitals": {"markerColor": "red", "icon": "plus-sign"},
+}
+# Fill colour per weather risk level (0 = no risk)
+RISK_COLORS = ("#2ca25f", "#fec44f", "#de2d26")
+LAYER_ORDER = ("risk", "routes", "hospitals", "patients", "rescuers")
+
+_MARKER_JS = """(function() {
+  var style = %(style)s;
+  var layer = %(group)s;
+  %(points)s.forEach(function(p) {
+    var marker = L.marker([p[0], p[1]], {icon: L.AwesomeMarkers.icon({icon: style.icon, markerColor: style.markerColor, prefix: "glyphicon"})});
+    if (p[2]) { marker.bindPopup(p[2]); }
+    if (p[3]) { marker.bindTooltip(p[3]); }
+    layer.addLayer(marker);
+  });
+  window.sarLayers[%(name)s] = layer;
+})();
+"""
+
+_RISK_JS = """(function() {
+  var colors = %(colors)s;
+  var layer = L.layerGroup();
+  %(points)s.forEach(function(c) {
+    var cell = L.rectangle([[c[0], c[1]], [c[2], c[3]]], {color: colors[c[4]], weight: 0, fillOpacity: 0.35});
+    if (c[5]) { cell.bindTooltip(c[5]); }
+    layer.addLayer(cell);
+  });
+  window.sarLayers["risk"] = layer;
+})();
+"""
+
+_ROUTE_JS = """(function() {
+  var layer = L.layerGroup();
+  %(points)s.forEach(function(r) {
+    L.polyline.antPath(r, {delay: 1000, color: "green", weight: 4}).addTo(layer);
+  });
+  window.sarLayers["routes"] = layer;
+})();
+"""
+
+_FINISH_JS = """(function() {
+  var map = %(map)s;
+  var overlays = {}, bounds = [];
+  Object.keys(window.sarLayers).forEach(function(name) {
+    var layer = window.sarLayers[name];
+    layer.addTo(map);
+    overlays[name] = layer;
+    layer.eachLayer(function(item) {
+      if (item.getLatLng) { bounds.push(item.getLatLng()); }
+      else if (item.getBounds) { bounds.push(item.getBounds().getNorthEast(), item.getBounds().getSouthWest()); }
+    });
+  });
+  L.control.layers(null, overlays).addTo(map);
+  if (bounds.length > 1) { map.fitBounds(L.latLngBounds(bounds), {padding: [20, 20]}); }
+  else if (bounds.length == 1) { map.setView(bounds[0], %(zoom)d); }
+})();
+"""
+
+
+@lru_cache(maxsize=8)
+def _base_template(tiles, zoom_start):
+    """Render the empty Leaflet page once; layers are injected as scripts before </html>."""
+    base = folium.Map(location=[0, 0], zoom_start=zoom_start, tiles=tiles)
+    page = base.get_root().render()
+    # Plugins must load after Leaflet itself, which folium only adds to the header while rendering
+    plugins = [f'<script src="{url}"></script>' for _, url in MarkerCluster.default_js + AntPath.default_js]
+    plugins += [f'<link rel="stylesheet" href="{url}"/>' for _, url in MarkerCluster.default_css]
+    page = page.replace("</head>", "\n".join(plugins) + "\n</head>", 1)
+    head, tail = page.rsplit("</html>", 1)
+    return head, "</html>" + tail, base.get_name()
+
+
+class MapRenderer:
+    def __init__(self, tiles="OpenStreetMap", zoom_start=12, cluster_threshold=50, output_dir="maps",
+                 template=None):
+        """
+        Incremental map of rescuers, patients, hospitals, routes and weather risk cells.
+
+        The Leaflet page is rendered once and shared by every renderer. Each layer is
+        kept as plain data and turned into a script fragment that is only rebuilt when
+        that layer changes, and the whole page is reused until any layer changes, so
+        large operations-center maps re-render quickly.
+
+        Args:
+            tiles (str): Folium tile set.
+            zoom_start (int): Zoom used when the map holds a single point.
+            cluster_threshold (int): Marker layers larger than this are clustered.
+            output_dir (str): Directory for per-session HTML files written by save().
+            template (tuple): (head, tail, map_name) page to inject layers into, e.g. from a
+                mission bundle; rendered from `tiles` if None.
+        """
+        self.tiles = tiles
+        self.zoom_start = zoom_start
+        self.cluster_threshold = cluster_threshold
+        self.output_dir = output_dir
+        self._template = template
+        self.version = 0
+        self.layers = {name: {} for name in LAYER_ORDER}
+        self._versions = {name: 0 for name in LAYER_ORDER}
+        # name -> (version, script) for the last rendered fragment of each layer
+        self._fragments = {}
+        # (version, page) for the last full render
+        self._page = None
+        self._lock = threading.Lock()
+
+    def add_marker(self, layer, key, lat, lon, popup=None, tooltip=None):
+        """Add or move one marker in a marker layer (rescuers, patients or hospitals)."""
+        self.update_points(layer, {key: (lat, lon, popup, tooltip)})
+
+    def update_points(self, layer, points):
+        """
+        Add or replace items in a layer without touching the others.
+
+        The layer is only marked changed if an item is new or different.
+
+        Args:
+            layer (str): Layer name from LAYER_ORDER.
+            points (dict): Key -> item. Marker items are (lat, lon, popup, tooltip), risk items
+                are (south, west, north, east, risk_level, tooltip) and routes are lists of [lat, lon].
+        """
+        with self._lock:
+            items = self.layers[layer]
+            if any(items.get(key, self) != item for key, item in points.items()):
+                items.update(points)
+                self._bump(layer)
+
+    def remove_points(self, layer, keys):
+        with self._lock:
+            for key in keys:
+                self.layers[layer].pop(key, None)
+            self._bump(layer)
+
+    def set_layer(self, layer, points):
+        """Replace everything in a layer."""
+        with self._lock:
+            self.layers[layer] = dict(points)
+            self._bump(layer)
+
+    def add_route(self, key, locations):
+        """Draw an animated path through a list of (lat, lon) points."""
+        self.update_points("routes", {key: [list(point) for point in locations]})
+
+    def set_risk_cells(self, tiles):
+        """
+        Show the latest weather risk tiles as shaded cells.
+
+        Args:
+            tiles (RiskTiles): Tiles built by WeatherAgent.set_operation_area.
+        """
+        south, west, north, east = tiles.bbox
+        half_lat = (north - south) / max(tiles.rows - 1, 1) / 2
+        half_lon = (east - west) / max(tiles.cols - 1, 1) / 2
+        cells = {}
+        for i, tile in enumerate(tiles.tiles or []):
+            lat, lon = tile["location"]
+            cells[i] = (lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon,
+                        min(tile["risk_level"], len(RISK_COLORS) - 1), ", ".join(tile["risks"]))
+        self.set_layer("risk", cells)
+
+    def template(self):
+        """Return the (head, tail, map_name) page that layers are injected into."""
+        if self._template is None:
+            return _base_template(self.tiles, self.zoom_start)
+        return self._template
+
+    def changed_since(self, version):
+        """Return the layers changed after `version`, to push only those to connected clients."""
+        return [name for name in LAYER_ORDER if self._versions[name] > version]
+
+    def render_layer(self, layer):
+        """Return the script that builds one layer, reusing the last one if the layer is unchanged."""
+        with self._lock:
+            version = self._versions[layer]
+            cached = self._fragments.get(layer)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            items = list(self.layers[layer].values())
+        script = self._build_fragment(layer, items)
+        with self._lock:
+            if self._versions[layer] == version:
+                self._fragments[layer] = (version, script)
+        return script
+
+    def render(self):
+        """Return the complete HTML page."""
+        with span("map_render"):
+            version = self.version
+            page = self._page
+            if page is not None and page[0] == version:
+                return page[1]
+            head, tail, map_name = self.template()
+            scripts = ["window.sarLayers = {};"]
+            scripts += [self.render_layer(name) for name in LAYER_ORDER if self.layers[name]]
+            scripts.append(_FINISH_JS % {"map": map_name, "zoom": self.zoom_start})
+            page = head + "<script>\n" + "\n".join(scripts) + "</script>\n" + tail
+            with self._lock:
+                if self.version == version:
+                    self._page = (version, page)
+            return page
+
+    def to_bytes(self):
+        """Headless render: the page as UTF-8 bytes, for serving without touching the filesystem."""
+        return self.render().encode("utf-8")
+
+    def save(self, path=None, session_id=None):
+        """
+        Write the page to `path`, or to `<output_dir>/<session_id>.html`.
+
+        The file is replaced atomically, so a browser reloading it never sees a partial page.
+
+        Returns:
+            str: The path written.
+        """
+        if path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{session_id or 'map'}.html")
+        page = self.render()
+        with span("map_save"):
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(page)
+            os.replace(temp_path, path)
+        return path
+
+    def _bump(self, layer):
+        self.version += 1
+        self._versions[layer] = self.version
+
+    def _build_fragment(self, layer, items):
+        # Leaflet treats popup and tooltip strings as HTML, and names come from OSM and user input
+        if layer in MARKER_STYLES:
+            items = [(lat, lon, _escape(popup), _escape(tooltip)) for lat, lon, popup, tooltip in items]
+        elif layer == "risk":
+            items = [cell[:5] + (_escape(cell[5]),) for cell in items]
+        points = json.dumps(items, separators=(",", ":")).replace("</", "<\\/")
+        if layer == "risk":
+            return _RISK_JS % {"colors": json.dumps(RISK_COLORS), "points": points}
+        if layer == "routes":
+            return _ROUTE_JS % {"points": points}
+        group = ("L.markerClusterGroup({chunkedLoading: true})" if len(items) > self.cluster_threshold
+                 else "L.featureGroup()")
+        return _MARKER_JS % {"style": json.dumps(MARKER_STYLES[layer]), "group": group,
+                             "points": points, "name": json.dumps(layer)}
+
+
+def _escape(text):
+    return html.escape(str(text)) if text else text
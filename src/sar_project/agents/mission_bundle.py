@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+import requests
+
+from sar_project.agents import weather_risk
+from sar_project.agents.fast_path import INTENTS
+from sar_project.agents.map_renderer import MapRenderer
+from sar_project.config import settings
+from sar_project.instrumentation import external_call
+from sar_project.knowledge.road_network import RoadGraph
+from sar_project.knowledge.spatial_index import EARTH_RADIUS_KM, KM_PER_DEGREE
+
+BUNDLE_VERSION = 2
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+FORECAST_FIELDS = ("wind_speed", "visibility", "temperature", "precipitation", "weather_code")
+# Where layer scripts are injected into the saved map page
+LAYER_MARKER = "<!-- sar-layers -->"
+
+# Protocol questions asked on most missions; their passages are stored so they need no vector query
+TOP_QUERIES = [
+    "How do I perform CPR on an adult?",
+    "What is the chest compression rate for CPR?",
+    "How do I apply a tourniquet?",
+    "How do I stop severe bleeding?",
+    "How do I treat hypothermia?",
+    "How do I treat a suspected spinal injury?",
+    "How do I splint a broken leg?",
+    "How do I treat a snake bite?",
+    "What are the signs of heat stroke?",
+    "How do I treat altitude sickness?",
+    "How do I treat a burn?",
+    "How do I put someone in the recovery position?",
+]
+
+
+def normalize_query(text):
+    """Lower-case and collapse whitespace and punctuation so trivially different phrasings share a key."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def fetch_hospitals(south, west, north, east, timeout=60):
+    """
+    Fetch every hospital in a bounding box from the Overpass API.
+
+    Returns:
+        list: (name, lat, lon) tuples.
+    """
+    query = f"""
+        [out:json][timeout:{timeout}];
+        nwr["amenity"="hospital"]({south},{west},{north},{east});
+        out center;
+        """
+    with external_call("overpass"):
+        response = requests.get(OVERPASS_URL, params={"data": query}, timeout=timeout)
+        response.raise_for_status()
+        elements = response.json().get("elements", [])
+
+    hospitals = []
+    for element in elements:
+        point = element if element["type"] == "node" else element.get("center", {})
+        if point.get("lat") is not None and point.get("lon") is not None:
+            name = element.get("tags", {}).get("name", "Unknown Hospital")
+            hospitals.append((name, float(point["lat"]), float(point["lon"])))
+    return hospitals
+
+
+def build_bundle(output_dir, south, west, north, east, rows=10, cols=10, hours=48, margin_km=50,
+                 queries=TOP_QUERIES, retrieve=None, fetch=weather_risk.fetch_conditions,
+                 fetch_hospitals=fetch_hospitals, inline_assets=True, road_graph=None):
+    """
+    Prefetch everything the agent needs for an operation area into a directory.
+
+    Arrays are written as .npy files so MissionBundle can memory-map them at startup.
+
+    Args:
+        output_dir (str): Bundle directory, created if needed.
+        south, west, north, east (float): Operation area.
+        rows, cols (int): Forecast grid resolution.
+        hours (int): Forecast horizon; the bundle stays useful for about this long.
+        margin_km (float): Also include hospitals this far outside the area.
+        queries (list): Protocol questions whose retrieved passages are stored, along with
+            the query of every fast-path intent.
+        retrieve (callable): Returns passages for a question; the firstaid KnowledgeBase by default.
+        fetch (callable): Fetches a ConditionsGrid for a list of points.
+        fetch_hospitals (callable): Fetches (name, lat, lon) hospitals for a bounding box.
+        inline_assets (bool): Embed the map's JavaScript and CSS so it renders without a CDN.
+        road_graph (RoadGraph or str): Road network (or its .npz path) to ship with the bundle,
+            saved together with its snapping index.
+
+    Returns:
+        dict: The manifest written alongside the files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = {}
+
+    def save_array(name, array):
+        filename = f"{name}.npy"
+        np.save(os.path.join(output_dir, filename), np.ascontiguousarray(array))
+        files[name] = filename
+
+    margin_lat = margin_km / KM_PER_DEGREE
+    margin_lon = margin_km / (KM_PER_DEGREE * max(np.cos(np.radians((south + north) / 2)), 0.01))
+    hospitals = fetch_hospitals(south - margin_lat, west - margin_lon, north + margin_lat, east + margin_lon)
+    save_array("hospital_lat", np.array([lat for _, lat, _ in hospitals], dtype=np.float64))
+    save_array("hospital_lon", np.array([lon for _, _, lon in hospitals], dtype=np.float64))
+
+    points = weather_risk.grid_points(south, west, north, east, rows, cols)
+    created_at = time.time()
+    conditions = fetch(points, hours)
+    save_array("forecast_locations", np.array(points, dtype=np.float64))
+    for field in FORECAST_FIELDS:
+        save_array(f"forecast_{field}", getattr(conditions, field).astype(np.float32))
+
+    if retrieve is None:
+        from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+        retrieve = KnowledgeBase().retrieve_relevant_text
+    # The fast path looks passages up by each intent's own query, so those are always stored
+    passages = {}
+    for query in list(queries) + [intent.query for intent in INTENTS]:
+        key = normalize_query(query)
+        if key not in passages:
+            passages[key] = retrieve(query)
+    with open(os.path.join(output_dir, "retrieval.json"), "w") as f:
+        json.dump(passages, f)
+
+    head, tail, map_name = MapRenderer().template()
+    page = head + LAYER_MARKER + tail
+    if inline_assets:
+        page = _inline_assets(page)
+    with open(os.path.join(output_dir, "map_template.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+
+    graph_file = None
+    if road_graph is not None:
+        if isinstance(road_graph, str):
+            road_graph = RoadGraph.load(road_graph)
+        graph_file = "road_graph.npz"
+        road_graph.save(os.path.join(output_dir, graph_file))
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "created_at": created_at,
+        # Start of the first hourly column; Open-Meteo begins at the current hour
+        "forecast_start": (conditions.start_time if conditions.start_time is not None
+                           else created_at - created_at % 3600),
+        "bbox": [south, west, north, east],
+        "grid": [rows, cols],
+        "hours": hours,
+        "hospital_names": [name for name, _, _ in hospitals],
+        "queries": list(passages),
+        "map_name": map_name,
+        "road_graph": graph_file,
+        "files": files,
+    }
+    # Written last, so a bundle with a manifest is always complete
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _inline_assets(page):
+    """Replace CDN script and stylesheet links with their contents; links that fail to download are kept."""
+    def download(url):
+        try:
+            with external_call("map_assets"):
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()
+            return response.text
+        except requests.RequestException:
+            return None
+
+    def script(match):
+        body = download(match.group(1))
+        return match.group(0) if body is None else "<script>" + body.replace("</script", "<\\/script") + "</script>"
+
+    def stylesheet(match):
+        body = download(match.group(1))
+        return match.group(0) if body is None else "<style>" + body + "</style>"
+
+    page = re.sub(r'<script src="(https?://[^"]+)"></script>', script, page)
+    return re.sub(r'<link rel="stylesheet" href="(https?://[^"]+)"\s*/?>', stylesheet, page)
+
+
+class MissionBundle:
+    def __init__(self, path):
+        """
+        Prefetched operation-area data, loaded for use with little or no connectivity.
+
+        Arrays are memory-mapped, so loading is fast and pages are shared between
+        worker processes that open the same bundle.
+
+        Args:
+            path (str): Directory written by build_bundle().
+        """
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {self.manifest['version']}")
+        self.arrays = {name: np.load(os.path.join(path, filename), mmap_mode="r")
+                       for name, filename in self.manifest["files"].items()}
+        self.hospital_names = self.manifest["hospital_names"]
+        with open(os.path.join(path, "retrieval.json")) as f:
+            self.passages = json.load(f)
+        self._template = None
+        self._road_graph = None
+
+    @property
+    def created_at(self):
+        return self.manifest["created_at"]
+
+    def covers(self, lat, lon):
+        """Return True if a coordinate is inside the operation area."""
+        south, west, north, east = self.manifest["bbox"]
+        return south <= lat <= north and west <= lon <= east
+
+    def hospitals(self, lat, lon):
+        """
+        All bundled hospitals with their straight-line distance from a point.
+
+        Returns:
+            list: (name, lat, lon, distance_km) tuples, closest first.
+        """
+        lats, lons = self.arrays["hospital_lat"], self.arrays["hospital_lon"]
+        if not len(lats):
+            return []
+        distances = _haversine_km(lat, lon, lats, lons)
+        return [(self.hospital_names[i], float(lats[i]), float(lons[i]), float(distances[i]))
+                for i in np.argsort(distances)]
+
+    def conditions(self):
+        """The bundled forecast as a ConditionsGrid."""
+        locations = [tuple(point) for point in self.arrays["forecast_locations"].tolist()]
+        return weather_risk.ConditionsGrid(locations, start_time=self.manifest["forecast_start"],
+                                           **{field: self.arrays[f"forecast_{field}"] for field in FORECAST_FIELDS})
+
+    def weather_at(self, lat, lon, now=None):
+        """
+        Forecast for the grid point nearest a coordinate, at the current hour of the bundle's forecast.
+
+        The reading taken when the bundle was built is served until the end of that hour,
+        and the hourly forecast after that.
+
+        Returns:
+            str: A summary in the format of FirstAidAgent.get_weather_conditions, or None
+                if the forecast does not cover the current time.
+        """
+        now = time.time() if now is None else now
+        hour = int((now - self.manifest["forecast_start"]) // 3600)
+        # Column 0 is the current reading, column k the hour starting forecast_start + (k - 1) h
+        column = hour + 1 if hour > 0 else 0
+        if hour < 0 or column > self.manifest["hours"]:
+            return None
+        locations = self.arrays["forecast_locations"]
+        i = int(np.argmin(_haversine_km(lat, lon, locations[:, 0], locations[:, 1])))
+        values = {field: float(self.arrays[f"forecast_{field}"][i, column]) for field in FORECAST_FIELDS}
+        code = "unknown" if np.isnan(values["weather_code"]) else int(values["weather_code"])
+        return (f"Temperature: {round(values['temperature'], 1)}°C, "
+                f"Wind Speed: {round(values['wind_speed'], 1)} km/h, Condition: {code}")
+
+    def cached_passages(self, query):
+        """Return stored passages for a known protocol question, or None."""
+        return self.passages.get(normalize_query(query))
+
+    def map_template(self):
+        """The bundled page as the (head, tail, map_name) template MapRenderer expects."""
+        if self._template is None:
+            with open(os.path.join(self.path, "map_template.html"), encoding="utf-8") as f:
+                head, tail = f.read().split(LAYER_MARKER, 1)
+            self._template = (head, tail, self.manifest["map_name"])
+        return self._template
+
+
+    def road_graph(self):
+        """The bundled RoadGraph, or None if the bundle was built without one."""
+        if self._road_graph is None and self.manifest.get("road_graph"):
+            self._road_graph = RoadGraph.load(os.path.join(self.path, self.manifest["road_graph"]))
+        return self._road_graph
+
+
+@lru_cache(maxsize=1)
+def default_bundle(path=settings.MISSION_BUNDLE):
+    """The bundle configured by SAR_MISSION_BUNDLE, loaded once per process; None if not configured."""
+    return MissionBundle(path) if path else None
+
+
+def _haversine_km(lat, lon, lats, lons):
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch a mission-area bundle for disconnected operations.")
+    parser.add_argument("output", help="Bundle directory")
+    parser.add_argument("--bbox", nargs=4, type=float, required=True, metavar=("SOUTH", "WEST", "NORTH", "EAST"))
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--margin-km", type=float, default=50)
+    parser.add_argument("--queries", help="File with one protocol question per line; defaults to the built-in list")
+    parser.add_argument("--road-graph", default=settings.ROAD_GRAPH,
+                        help="Road graph .npz to include; defaults to SAR_ROAD_GRAPH")
+    args = parser.parse_args()
+
+    queries = TOP_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    manifest = build_bundle(args.output, *args.bbox, rows=args.rows, cols=args.cols, hours=args.hours,
+                            margin_km=args.margin_km, queries=queries, road_graph=args.road_graph)
+    print(f"Bundle written to {args.output}: {len(manifest['hospital_names'])} hospitals, "
+          f"{args.rows * args.cols} forecast points over {args.hours} h, {len(manifest['queries'])} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Default worker threads per agent, so agents still running past a deadline leave room for later incidents
+WORKERS_PER_AGENT = 4
+
+
+class IncidentOrchestrator:
+    def __init__(self, agents, max_workers=None, deadline=30):
+        """
+        Fans one incident request out to several SAR agents in parallel.
+
+        Python threads cannot be interrupted, so an agent that overruns its deadline
+        keeps its worker until it returns. The pool therefore defaults to
+        WORKERS_PER_AGENT threads per agent, but if agents keep hanging the pool can
+        still fill up. Later incidents then queue and may miss their own deadlines.
+        `stragglers` counts agents still running after their incident returned.
+
+        Args:
+            agents (dict): Agent name -> SARBaseAgent, e.g. {"weather": WeatherAgent()}.
+            max_workers (int): Threads shared by all requests; WORKERS_PER_AGENT per agent by default.
+            deadline (float): Default seconds to wait before returning partial results.
+        """
+        self.agents = agents
+        self.deadline = deadline
+        self.stragglers = 0
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or len(agents) * WORKERS_PER_AGENT,
+                                           thread_name_prefix="orchestrator")
+
+    def handle(self, incident, knowledge_base=None, deadline=None):
+        """
+        Send each agent its part of an incident at the same time and merge the answers.
+
+        Args:
+            incident (dict): Agent name -> message for that agent. Only the agents
+                named here are called.
+            knowledge_base: Optional state shared by the agents. A snapshot is taken
+                once so every agent sees the same view, even if it changes meanwhile.
+            deadline (float): Seconds to wait; agents still running are reported as
+                timed out and their late answers are dropped.
+
+        Returns:
+            dict: "results" and "errors" keyed by agent name, "timed_out" agent names,
+                "complete" (True when every agent answered) and "elapsed" seconds.
+        """
+        unknown = [name for name in incident if name not in self.agents]
+        if unknown:
+            raise ValueError(f"Unknown agents: {', '.join(unknown)}")
+
+        started = time.monotonic()
+        snapshot = knowledge_base.snapshot() if hasattr(knowledge_base, "snapshot") else knowledge_base
+        futures = {
+            self.executor.submit(self._bind(self.agents[name], snapshot).process_request, message): name
+            for name, message in incident.items()
+        }
+        done, not_done = wait(futures, timeout=self.deadline if deadline is None else deadline)
+
+        results, errors = {}, {}
+        for future in done:
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+                continue
+            # Agents report their own failures as {"error": ...} rather than raising
+            if isinstance(result, dict) and set(result) == {"error"}:
+                errors[name] = result["error"]
+            else:
+                results[name] = result
+        for future in not_done:
+            # cancel() only stops agents that have not started; running ones finish in the background
+            if not future.cancel():
+                with self._lock:
+                    self.stragglers += 1
+                future.add_done_callback(self._straggler_done)
+
+        return {
+            "results": results,
+            "errors": errors,
+            "timed_out": sorted(futures[future] for future in not_done),
+            "complete": not not_done,
+            "elapsed": time.monotonic() - started,
+        }
+
+    def _straggler_done(self, future):
+        with self._lock:
+            self.stragglers -= 1
+
+    def get_statuses(self):
+        """Return each agent's mission status"""
+        return {name: agent.get_status() for name, agent in self.agents.items()}
+
+    def update_statuses(self, status):
+        """Set the same mission status on every agent"""
+        return {name: agent.update_status(status) for name, agent in self.agents.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _bind(agent, snapshot):
+        if snapshot is None:
+            return agent
+        if hasattr(agent, "bind"):
+            return agent.bind(snapshot)
+        bound = copy.copy(agent)
+        bound.kb = snapshot
+        return bound
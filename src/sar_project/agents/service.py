@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web, WSMsgType
+
+from sar_project import instrumentation
+from sar_project.agents.first_aid_agent import FirstAidAgent
+from sar_project.config import settings
+from sar_project.knowledge.session_manager import SessionManager
+from sar_project.knowledge.session_store import SessionStore
+
+_DONE = object()
+LOCATION_ERROR = "Expected numeric 'lat' and 'lon'"
+MESSAGE_ERROR = "Missing 'message'"
+
+
+def _parse_location(body):
+    """Return (lat, lon) as floats from a request body, or None if either is missing or not numeric."""
+    try:
+        return float(body["lat"]), float(body["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _parse_message(body):
+    """Return the non-empty chat message from a request body, or None."""
+    message = body.get("message")
+    return message if isinstance(message, str) and message.strip() else None
+
+
+def _profiled(func, profiler):
+    """Wrap a blocking step so it runs under a turn's profiler in whichever worker thread picks it up."""
+    if profiler is None:
+        return func
+    return functools.partial(instrumentation.profiler.run, profiler, func)
+
+
+async def _read_body(request):
+    """Return the JSON object sent with a request, or None if the body is not one."""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+class FirstAidService:
+    def __init__(self, agent=None, sessions=None, max_workers=8, embed_workers=2,
+                 max_in_flight=64, stream_buffer=16, eviction_interval=60, profile_dir=settings.PROFILE_DIR):
+        """
+        Asyncio HTTP/WebSocket front end for FirstAidAgent.
+
+        Args:
+            agent (FirstAidAgent): Shared agent; it is bound to each session's state per request.
+            sessions (SessionManager): Holds per-session state.
+            max_workers (int): Threads for blocking network calls (Gemini, Overpass, Open-Meteo).
+            embed_workers (int): Threads for CPU-bound retrieval and prompt building.
+            max_in_flight (int): Requests accepted at once; beyond this the service answers 503.
+            stream_buffer (int): Chunks buffered per streaming response before the producer waits.
+            eviction_interval (float): Seconds between idle-session sweeps.
+            profile_dir (str): Where .prof files are written for sessions with profiling enabled.
+        """
+        self.agent = agent if agent is not None else FirstAidAgent()
+        self.sessions = sessions if sessions is not None else SessionManager()
+        self.max_workers = max_workers
+        self.embed_workers = embed_workers
+        self.max_in_flight = max_in_flight
+        self.stream_buffer = stream_buffer
+        self.eviction_interval = eviction_interval
+        self.profile_dir = profile_dir
+        self.io_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="firstaid-io")
+        self.embed_pool = ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="firstaid-embed")
+        self.in_flight = 0
+        self.rejected = 0
+        self._session_locks = weakref.WeakValueDictionary()
+
+    def create_app(self):
+        """Build the aiohttp application with all routes registered."""
+        app = web.Application(middlewares=[self._backpressure])
+        app.add_routes([
+            web.post("/sessions/{session_id}/chat", self.handle_chat),
+            web.post("/sessions/{session_id}/location", self.handle_location),
+            web.get("/sessions/{session_id}/map", self.handle_map),
+            web.get("/sessions/{session_id}/ws", self.handle_websocket),
+            web.post("/sessions/{session_id}/profile", self.handle_profile),
+            web.get("/status", self.handle_status),
+            web.get("/metrics", self.handle_metrics),
+        ])
+        app.on_startup.append(self._start_eviction)
+        app.on_cleanup.append(self._shutdown)
+        return app
+
+    @web.middleware
+    async def _backpressure(self, request, handler):
+        # An open WebSocket is mostly idle, so its messages are counted per turn instead
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await handler(request)
+        if request.path in ("/status", "/metrics"):
+            self.in_flight += 1
+        elif not self._admit():
+            # Shed load instead of queueing without bound once every slot is taken
+            return web.json_response({"error": "Service busy, retry shortly"}, status=503,
+                                     headers={"Retry-After": "1"})
+        try:
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def _admit(self):
+        """Take an in-flight slot, or count a rejection and return False if none is free."""
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            instrumentation.registry.increment("sar_service_rejected_total")
+            return False
+        self.in_flight += 1
+        return True
+
+    async def _session(self, request):
+        session_id = request.match_info["session_id"]
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        # Resuming a session can read the SQLite store, so keep it off the event loop
+        state = await self._run(self.io_pool, self.sessions.get, session_id)
+        return self.agent.bind(state), lock
+
+    async def _run(self, pool, func, *args, profiler=None):
+        return await asyncio.get_running_loop().run_in_executor(pool, _profiled(func, profiler), *args)
+
+    async def _stream(self, agent, prompt, profiler=None):
+        """Run the Gemini stream in the IO pool and hand chunks back through a bounded queue."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.stream_buffer)
+        stopped = threading.Event()
+
+        def produce():
+            try:
+                for chunk in agent.stream_gemini(prompt):
+                    if stopped.is_set():
+                        break
+                    # Blocks the worker while the client is slow to read
+                    asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+            finally:
+                asyncio.run_coroutine_threadsafe(queue.put(_DONE), loop).result()
+
+        producer = loop.run_in_executor(self.io_pool, _profiled(produce, profiler))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+        finally:
+            # If the client went away, unblock the producer so its worker is released
+            stopped.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+
+    async def _chat_turn(self, agent, message):
+        """
+        Yield the response chunks for a message and record it.
+
+        A fast-path answer is yielded before the patient data update, which still finishes
+        before the caller releases the session lock. Callers close the generator with
+        contextlib.aclosing, so the turn is recorded even if the client goes away.
+        """
+        # The steps run in worker threads, so each one is profiled there and written as one file per turn
+        with instrumentation.profiler.collect(agent.kb.session_id, "chat_turn") as profiler:
+            answer = await self._run(self.embed_pool, agent.fast_answer, message, profiler=profiler)
+            if answer is not None:
+                try:
+                    yield answer
+                finally:
+                    await self._record_message(agent, message, profiler)
+                return
+
+            # Gemini needs the updated patient data, so record first
+            await self._record_message(agent, message, profiler)
+            prompt = await self._run(self.embed_pool, agent.generate_prompt, message, profiler=profiler)
+            async for chunk in self._stream(agent, prompt, profiler=profiler):
+                yield chunk
+
+    async def _record_message(self, agent, message, profiler):
+        await self._run(self.io_pool, agent.update_user_data, message, None, None, profiler=profiler)
+        history_length = len(agent.kb.chat_history)
+        await self._run(self.io_pool, agent.summarize_chat_history, profiler=profiler)
+
+        turn = {"message": message, "data": agent.kb.data}
+        if len(agent.kb.chat_history) < history_length:
+            turn["summary"] = agent.kb.chat_history[0]
+        await self._run(self.io_pool, self.sessions.record, agent.kb, "message", turn, profiler=profiler)
+
+    async def _update_location(self, agent, lat, lon):
+        result = await self._run(self.io_pool, agent.update_location, lat, lon)
+        turn = {"lat": agent.kb.lat, "lon": agent.kb.lon, **result}
+        await self._run(self.io_pool, self.sessions.record, agent.kb, "location", turn)
+        return result
+
+    async def handle_chat(self, request):
+        body = await _read_body(request)
+        message = _parse_message(body) if body is not None else None
+        if message is None:
+            return web.json_response({"error": MESSAGE_ERROR}, status=400)
+        location = None
+        if body.get("lat") is not None or body.get("lon") is not None:
+            location = _parse_location(body)
+            if location is None:
+                return web.json_response({"error": LOCATION_ERROR}, status=400)
+
+        agent, lock = await self._session(request)
+        async with lock:
+            if location is not None:
+                await self._update_location(agent, *location)
+            if agent.kb.nearest_hospital is None:
+                return web.json_response({"error": "Set a location before chatting"}, status=409)
+
+            response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            async with contextlib.aclosing(self._chat_turn(agent, message)) as chunks:
+                async for chunk in chunks:
+                    await response.write(chunk.encode("utf-8"))
+            await response.write_eof()
+            return response
+
+    async def handle_location(self, request):
+        body = await _read_body(request)
+        location = _parse_location(body) if body is not None else None
+        if location is None:
+            return web.json_response({"error": LOCATION_ERROR}, status=400)
+
+        agent, lock = await self._session(request)
+        async with lock:
+            return web.json_response(await self._update_location(agent, *location))
+
+    async def handle_map(self, request):
+        agent, lock = await self._session(request)
+        async with lock:
+            if agent.kb.nearest_hospital is None:
+                return web.json_response({"error": "Set a location before requesting a map"}, status=409)
+            renderer = await self._run(self.embed_pool, agent.build_map)
+            if renderer is None:
+                return web.json_response({"error": "No hospital location to map"}, status=422)
+            html = await self._run(self.embed_pool, renderer.to_bytes)
+        return web.Response(body=html, content_type="text/html", charset="utf-8")
+
+    async def handle_websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        agent, lock = await self._session(request)
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                payload = json.loads(msg.data)
+            except json.JSONDecodeError:
+                payload = None
+            if not isinstance(payload, dict):
+                await ws.send_json({"type": "error", "error": "Expected a JSON object"})
+                continue
+            if not self._admit():
+                await ws.send_json({"type": "error", "error": "Service busy, retry shortly"})
+                continue
+            try:
+                async with lock:
+                    await self._handle_ws_payload(ws, agent, payload)
+            finally:
+                self.in_flight -= 1
+        return ws
+
+    async def _handle_ws_payload(self, ws, agent, payload):
+        if payload.get("type") == "location":
+            location = _parse_location(payload)
+            if location is None:
+                await ws.send_json({"type": "error", "error": LOCATION_ERROR})
+                return
+            result = await self._update_location(agent, *location)
+            await ws.send_json({"type": "location", **result})
+        elif payload.get("type") == "chat":
+            message = _parse_message(payload)
+            if message is None:
+                await ws.send_json({"type": "error", "error": MESSAGE_ERROR})
+                return
+            if agent.kb.nearest_hospital is None:
+                await ws.send_json({"type": "error", "error": "Set a location before chatting"})
+                return
+            async with contextlib.aclosing(self._chat_turn(agent, message)) as chunks:
+                async for chunk in chunks:
+                    await ws.send_json({"type": "chunk", "text": chunk})
+            await ws.send_json({"type": "done"})
+        else:
+            await ws.send_json({"type": "error", "error": "Unknown message type"})
+
+    async def handle_status(self, request):
+        return web.json_response({
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+            "io_workers": self.max_workers,
+            "embed_workers": self.embed_workers,
+            "sessions": len(self.sessions),
+        })
+
+    async def handle_metrics(self, request):
+        self._record_service_gauges()
+        return web.Response(text=instrumentation.export_prometheus(),
+                            content_type="text/plain", charset="utf-8")
+
+    async def handle_profile(self, request):
+        """Turn cProfile on or off for one session; profiles are written to the server's profile_dir."""
+        body = await _read_body(request)
+        if body is None:
+            return web.json_response({"error": "Expected a JSON object"}, status=400)
+        if "output_dir" in body:
+            return web.json_response({"error": "The profile directory is set by the server"}, status=400)
+        session_id = request.match_info["session_id"]
+        if body.get("enabled", True):
+            instrumentation.profiler.enable(session_id, self.profile_dir)
+        else:
+            instrumentation.profiler.disable(session_id)
+        return web.json_response({"session_id": session_id, "profiling": bool(body.get("enabled", True))})
+
+    def _record_service_gauges(self):
+        instrumentation.registry.set_gauge("sar_service_in_flight", self.in_flight)
+        instrumentation.registry.set_gauge("sar_service_sessions", len(self.sessions))
+
+    async def _start_eviction(self, app):
+        async def sweep():
+            while True:
+                await asyncio.sleep(self.eviction_interval)
+                self.sessions.evict_idle()
+
+        app["eviction_task"] = asyncio.create_task(sweep())
+
+    async def _shutdown(self, app):
+        app["eviction_task"].cancel()
+        self.io_pool.shutdown(wait=False)
+        self.embed_pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the first aid agent over HTTP and WebSocket.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="threads for network-bound calls")
+    parser.add_argument("--embed-workers", type=int, default=2, help="threads for embedding and retrieval")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="requests accepted before answering 503")
+    parser.add_argument("--db", help="SQLite file for durable sessions (kept in memory only if omitted)")
+    parser.add_argument("--profile-dir", default=settings.PROFILE_DIR, help="directory for per-session .prof files")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db) if args.db else None
+    service = FirstAidService(sessions=SessionManager(store=store), max_workers=args.workers,
+                              embed_workers=args.embed_workers, max_in_flight=args.max_in_flight,
+                              profile_dir=args.profile_dir)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 from sar_project.agents.base_agent import SARBaseAgent
+from sar_project.agents import weather_risk
+from sar_project.instrumentation import count_cache
+from sar_project.knowledge.cache import TTLCache
+from sar_project.knowledge.spatial_index import parse_coordinates
 class WeatherAgent(SARBaseAgent):
-    def __init__(self, name="weather_specialist"):
+    def __init__(self, name="weather_specialist", conditions_ttl=300, forecast_ttl=900):
         super().__init__(
             name=name,
             role="Weather Specialist",
@@ -10,19 +14,26 @@ class WeatherAgent(SARBaseAgent):
             3. Provide safety recommendations
             4. Monitor changing conditions"""
         )
-        self.current_conditions = {}
-        self.forecasts = {}
-        
+        self.current_conditions = TTLCache(ttl=conditions_ttl, name="weather_conditions")
+        self.forecasts = TTLCache(ttl=forecast_ttl, name="weather_forecast")
+        self.risk_assessments = TTLCache(ttl=conditions_ttl, name="weather_risk")
+        self.risk_tiles = None
+
     def process_request(self, message):
         """Process weather-related requests"""
         try:
             # Example processing logic
             if "get_conditions" in message:
-                return self.get_current_conditions(message["location"])
+                return self.cached_conditions(message["location"])
             elif "get_forecast" in message:
-                return self.get_weather_forecast(message["location"], message["duration"])
+                return self.cached_forecast(message["location"], message["duration"])
             elif "assess_risk" in message:
-                return self.assess_weather_risk(message["location"])
+                return self.risk_at(message["location"])
+            elif "assess_area_risk" in message:
+                return self.assess_area_risk(message["locations"], message.get("hours", 2))
+            elif "assess_route_risk" in message:
+                return self.assess_route_risk(message["route"], message.get("spacing_km", 1.0),
+                                              message.get("hours", 2))
             else:
                 return {"error": "Unknown request type"}
         except Exception as e:
@@ -51,21 +62,96 @@ class WeatherAgent(SARBaseAgent):
             ]
         }
 
+    def cached_conditions(self, location):
+        """Current conditions for location, served from cache while fresh"""
+        key = _cache_key(location)
+        return self.current_conditions.get_or_set(key, lambda: self.get_current_conditions(location))
+
+    def cached_forecast(self, location, duration):
+        """Forecast for location, served from cache while fresh"""
+        key = (_cache_key(location), duration)
+        return self.forecasts.get_or_set(key, lambda: self.get_weather_forecast(location, duration))
+
     def assess_weather_risk(self, location):
         """Assess weather-related risks for SAR operations"""
-        conditions = self.get_current_conditions(location)
-        forecast = self.get_weather_forecast(location, "2h")
+        conditions = self.cached_conditions(location)
+        forecast = self.cached_forecast(location, "2h")
         risks = []
         if conditions["wind_speed"] > 30:
             risks.append("high_wind")
         if conditions["visibility"] < 5:
             risks.append("low_visibility")
+        return self._risk_result(risks)
+
+    def assess_area_risk(self, locations, hours=2):
+        """Assess weather risk for many locations at once, including the forecast horizon"""
+        conditions = weather_risk.fetch_conditions(locations, hours)
+        return self._risk_grid(conditions)
+
+    def assess_route_risk(self, route, spacing_km=1.0, hours=2):
+        """Assess weather risk at evenly spaced points along a route or search corridor"""
+        return self.assess_area_risk(weather_risk.corridor_points(route, spacing_km), hours)
+
+    def set_operation_area(self, south, west, north, east, rows=10, cols=10, refresh_interval=600):
+        """Precompute risk tiles for the operation area and keep them refreshed in the background"""
+        self.clear_operation_area()
+        self.risk_tiles = weather_risk.RiskTiles(south, west, north, east, rows, cols,
+                                                 refresh_interval=refresh_interval)
+        self.risk_tiles.start(self._risk_cell)
+        return self.risk_tiles
+
+    def clear_operation_area(self):
+        """Stop refreshing risk tiles"""
+        if self.risk_tiles is not None:
+            self.risk_tiles.stop()
+            self.risk_tiles = None
+
+    def risk_at(self, location):
+        """
+        Current risk for a location, in the same form as assess_weather_risk wherever it comes from:
+        the precomputed tiles when the location falls inside them, else the cached assessment
+        """
+        coordinates = parse_coordinates(location)
+        if coordinates is not None and self.risk_tiles is not None:
+            tile = self.risk_tiles.lookup(*coordinates)
+            count_cache("risk_tiles", tile is not None)
+            if tile is not None:
+                return self._risk_result(tile["current_risks"])
+        key = _cache_key(location)
+        assessment = self.risk_assessments.get_or_set(key, lambda: self.assess_weather_risk(location))
+        # A fresh dict each time, so callers cannot change the cached assessment
+        return self._risk_result(assessment["risks"])
+
+    def _risk_result(self, risks):
         return {
             "risk_level": len(risks),
-            "risks": risks,
+            "risks": list(risks),
             "recommendations": self._generate_recommendations(risks)
         }
 
+    def _risk_grid(self, conditions):
+        """Turn the vectorized assessment into a per-location risk grid"""
+        assessment = weather_risk.assess_grid(conditions)
+        cells = [self._risk_cell(location, assessment, i) for i, location in enumerate(conditions.locations)]
+        return {
+            "max_risk_level": int(assessment["risk_level"].max(initial=0)),
+            "locations": cells,
+        }
+
+    def _risk_cell(self, location, assessment, i):
+        """Risk summary for one location of a vectorized assessment"""
+        risks = [name for name in weather_risk.RISK_NAMES if assessment[name][i]]
+        return {
+            "location": location,
+            "risk_level": int(assessment["risk_level"][i]),
+            "risks": risks,
+            "current_risks": [name for name in weather_risk.RISK_NAMES if assessment[f"{name}_now"][i]],
+            "first_risk_hour": int(assessment["first_risk_hour"][i]),
+            "max_wind_speed": float(assessment["max_wind_speed"][i]),
+            "min_visibility": float(assessment["min_visibility"][i]),
+            "recommendations": self._generate_recommendations(risks),
+        }
+
     def _generate_recommendations(self, risks):
         """Generate safety recommendations based on risks"""
         recommendations = []
@@ -84,3 +170,8 @@ class WeatherAgent(SARBaseAgent):
     def get_status(self):
         """Get the agent's current status"""
         return getattr(self, "status", "unknown")
+
+
+def _cache_key(location):
+    """Locations may arrive as lists from JSON; make them hashable"""
+    return tuple(location) if isinstance(location, list) else location
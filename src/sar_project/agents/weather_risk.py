@@ -0,0 +1,236 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+
+from sar_project.instrumentation import external_call, timed
+from sar_project.knowledge.spatial_index import haversine_km
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+# Open-Meteo accepts many coordinates per call; chunk to keep URLs a sensible length
+MAX_LOCATIONS_PER_REQUEST = 100
+
+# Same rules as WeatherAgent.assess_weather_risk: wind in km/h, visibility in km
+WIND_LIMIT = 30
+VISIBILITY_LIMIT = 5
+RISK_NAMES = ("high_wind", "low_visibility")
+
+
+class ConditionsGrid:
+    """
+    Current conditions plus an hourly forecast for many locations, as (locations, hours) arrays.
+
+    Column 0 is the current reading; column k >= 1 is the hour starting start_time + (k - 1) hours.
+    start_time is None when unknown, and weather_code is all NaN if it was not fetched.
+    """
+
+    def __init__(self, locations, wind_speed, visibility, temperature, precipitation, weather_code=None,
+                 start_time=None):
+        self.locations = locations
+        self.wind_speed = wind_speed
+        self.visibility = visibility
+        self.temperature = temperature
+        self.precipitation = precipitation
+        self.weather_code = weather_code if weather_code is not None else np.full(np.shape(wind_speed), np.nan)
+        self.start_time = start_time
+
+    def __len__(self):
+        return len(self.locations)
+
+
+def fetch_conditions(locations, hours=2, timeout=30):
+    """
+    Fetch current conditions and an hourly forecast for many locations from Open-Meteo.
+
+    Column 0 of each array is the current reading and columns 1..hours are the forecast,
+    starting at the current hour truncated to the hour. Missing values are NaN.
+
+    Args:
+        locations (list): (lat, lon) pairs.
+        hours (int): Forecast horizon in hours.
+        timeout (float): Seconds to wait for each request.
+
+    Returns:
+        ConditionsGrid: Arrays shaped (len(locations), hours + 1).
+    """
+    variables = "wind_speed_10m,visibility,temperature_2m,precipitation,weather_code"
+    columns = {name: [] for name in variables.split(",")}
+    start_time = None
+    for start in range(0, len(locations), MAX_LOCATIONS_PER_REQUEST):
+        chunk = locations[start:start + MAX_LOCATIONS_PER_REQUEST]
+        with external_call("open_meteo"):
+            response = requests.get(OPEN_METEO_URL, params={
+                "latitude": ",".join(f"{lat:.4f}" for lat, _ in chunk),
+                "longitude": ",".join(f"{lon:.4f}" for _, lon in chunk),
+                "current": variables,
+                "hourly": variables,
+                "forecast_hours": hours,
+                "wind_speed_unit": "kmh",
+            }, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        # A single location comes back as an object, several as a list
+        for point in data if isinstance(data, list) else [data]:
+            current, hourly = point.get("current", {}), point.get("hourly", {})
+            if start_time is None and hourly.get("time"):
+                # Hourly times are local to the requested timezone (GMT unless set), without an offset
+                start = datetime.fromisoformat(hourly["time"][0]).replace(tzinfo=timezone.utc)
+                start_time = start.timestamp() - point.get("utc_offset_seconds", 0)
+            for name, values in columns.items():
+                forecast = (hourly.get(name) or [])[:hours]
+                row = [current.get(name)] + forecast + [None] * (hours - len(forecast))
+                values.append(row)
+
+    def as_array(name):
+        return np.array(columns[name], dtype=float).reshape(len(locations), hours + 1)
+
+    return ConditionsGrid(
+        list(locations),
+        wind_speed=as_array("wind_speed_10m"),
+        # Open-Meteo reports visibility in metres
+        visibility=as_array("visibility") / 1000.0,
+        temperature=as_array("temperature_2m"),
+        precipitation=as_array("precipitation"),
+        weather_code=as_array("weather_code"),
+        start_time=start_time,
+    )
+
+
+@timed("weather_risk_grid")
+def assess_grid(conditions):
+    """
+    Apply the weather risk rules to every location and forecast hour at once.
+
+    Args:
+        conditions (ConditionsGrid): Output of fetch_conditions().
+
+    Returns:
+        dict: Arrays of length len(conditions): "risk_level", one boolean array per
+            risk name over the whole horizon, the same per risk for the current reading
+            only ("<risk>_now"), "max_wind_speed", "min_visibility" and "first_risk_hour"
+            (0 for now, -1 if no risk within the horizon).
+    """
+    # NaN comparisons are False, so missing readings never raise a risk
+    hourly_flags = np.stack([
+        conditions.wind_speed > WIND_LIMIT,
+        conditions.visibility < VISIBILITY_LIMIT,
+    ])
+    flags = hourly_flags.any(axis=2)
+    any_hour = hourly_flags.any(axis=0)
+    first_risk_hour = np.where(any_hour.any(axis=1), any_hour.argmax(axis=1), -1)
+
+    # fmax/fmin skip NaN, giving NaN only when a location has no readings at all
+    max_wind = np.fmax.reduce(conditions.wind_speed, axis=1)
+    min_visibility = np.fmin.reduce(conditions.visibility, axis=1)
+
+    result = {name: flags[i] for i, name in enumerate(RISK_NAMES)}
+    result.update({f"{name}_now": hourly_flags[i][:, 0] for i, name in enumerate(RISK_NAMES)})
+    result.update({
+        "risk_level": flags.sum(axis=0),
+        "max_wind_speed": max_wind,
+        "min_visibility": min_visibility,
+        "first_risk_hour": first_risk_hour,
+    })
+    return result
+
+
+def corridor_points(route, spacing_km=1.0):
+    """
+    Sample points along a route at roughly even spacing, including every vertex.
+
+    Args:
+        route (list): (lat, lon) vertices.
+        spacing_km (float): Distance between samples.
+
+    Returns:
+        list: (lat, lon) samples in route order.
+    """
+    points = [tuple(route[0])]
+    for (lat1, lon1), (lat2, lon2) in zip(route, route[1:]):
+        steps = max(1, int(np.ceil(haversine_km(lat1, lon1, lat2, lon2) / spacing_km)))
+        fractions = np.arange(1, steps + 1) / steps
+        points.extend(zip(lat1 + (lat2 - lat1) * fractions, lon1 + (lon2 - lon1) * fractions))
+    return [(float(lat), float(lon)) for lat, lon in points]
+
+
+def grid_points(south, west, north, east, rows, cols):
+    """Return a rows x cols lattice of (lat, lon) points covering a bounding box, row by row."""
+    lats = np.linspace(south, north, rows)
+    lons = np.linspace(west, east, cols)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    return list(zip(lat_grid.ravel().tolist(), lon_grid.ravel().tolist()))
+
+
+class RiskTiles:
+    def __init__(self, south, west, north, east, rows=10, cols=10, hours=2, refresh_interval=600,
+                 fetch=None):
+        """
+        Precomputed weather risk for a lattice of tiles covering the operation area.
+
+        Tiles are rebuilt by a background thread, and lookups only index into the
+        latest result, so repeated queries never touch the network.
+
+        Args:
+            south, west, north, east (float): Bounding box of the operation area.
+            rows, cols (int): Number of tiles along each axis.
+            hours (int): Forecast horizon included in each tile's assessment.
+            refresh_interval (float): Seconds between background refreshes.
+            fetch (callable): Fetches a ConditionsGrid for a list of points; fetch_conditions by default.
+        """
+        self.bbox = (south, west, north, east)
+        self.rows = rows
+        self.cols = cols
+        self.hours = hours
+        self.refresh_interval = refresh_interval
+        self.fetch = fetch if fetch is not None else fetch_conditions
+        self.points = grid_points(south, west, north, east, rows, cols)
+        self.tiles = None
+        self.updated_at = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, build_cell):
+        """
+        Fetch conditions for every tile centre and rebuild the tiles.
+
+        Args:
+            build_cell (callable): Turns (location, assessment, index) into the dict served for a tile.
+        """
+        assessment = assess_grid(self.fetch(self.points, self.hours))
+        tiles = [build_cell(point, assessment, i) for i, point in enumerate(self.points)]
+        # Swap in one assignment so readers never see a half-built set
+        self.tiles = tiles
+        self.updated_at = time.time()
+
+    def start(self, build_cell):
+        """Refresh now and then every refresh_interval seconds on a daemon thread."""
+        def run():
+            while True:
+                try:
+                    self.refresh(build_cell)
+                    self.last_error = None
+                except Exception as e:
+                    # Keep serving the previous tiles until the next refresh succeeds
+                    self.last_error = str(e)
+                if self._stop.wait(self.refresh_interval):
+                    return
+
+        self._thread = threading.Thread(target=run, name="risk-tiles", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def lookup(self, lat, lon):
+        """Return the tile covering a coordinate, or None if it is outside the area or not built yet."""
+        tiles = self.tiles
+        south, west, north, east = self.bbox
+        if tiles is None or not (south <= lat <= north and west <= lon <= east):
+            return None
+        # Tile centres sit on a linspace lattice, so round to the nearest one
+        row = round((lat - south) / (north - south) * (self.rows - 1)) if self.rows > 1 else 0
+        col = round((lon - west) / (east - west) * (self.cols - 1)) if self.cols > 1 else 0
+        return tiles[row * self.cols + col]
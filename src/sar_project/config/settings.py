@@ -17,6 +17,29 @@ DEFAULT_MODEL = "gpt-4"
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TIMEOUT = 600
 
+# Embeddings: set SAR_EMBEDDING_SOCKET to share one model server between workers
+EMBEDDING_MODEL = os.getenv("SAR_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_SOCKET = os.getenv("SAR_EMBEDDING_SOCKET")
+# "cpu" enables int8 quantization, thread control and tuned batching on GPU-less hardware
+EMBEDDING_MODE = os.getenv("SAR_EMBEDDING_MODE", "default")
+EMBEDDING_QUANTIZE = os.getenv("SAR_EMBEDDING_QUANTIZE", "1") != "0"
+EMBEDDING_THREADS = int(os.getenv("SAR_EMBEDDING_THREADS", "0")) or None
+# 0 tunes the batch size when the model loads
+EMBEDDING_BATCH_SIZE = int(os.getenv("SAR_EMBEDDING_BATCH_SIZE", "0")) or None
+
+# Routing: .npz road graph built by sar_project.knowledge.road_network; unset ranks by straight line
+ROAD_GRAPH = os.getenv("SAR_ROAD_GRAPH")
+
+# Offline mode: directory written by sar_project.agents.mission_bundle for the operation area
+MISSION_BUNDLE = os.getenv("SAR_MISSION_BUNDLE")
+
+# Fast path: answer confident protocol questions from curated templates instead of the LLM
+FAST_PATH = os.getenv("SAR_FAST_PATH", "1") != "0"
+FAST_PATH_THRESHOLD = float(os.getenv("SAR_FAST_PATH_THRESHOLD", "0.75"))
+
+# Directory for the per-session cProfile files enabled through the service's /profile endpoint
+PROFILE_DIR = os.getenv("SAR_PROFILE_DIR", "profiles")
+
 # File paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
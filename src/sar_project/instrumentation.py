@@ -0,0 +1,274 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from in-memory lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One extra slot for values above the largest bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._span_log = None
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def log_span(self, record):
+        span_log = self._span_log
+        if span_log is not None:
+            line = json.dumps(record, default=str) + "\n"
+            with self._lock:
+                span_log.write(line)
+
+    def set_span_log(self, path):
+        """Append every finished span to a JSON lines file; None turns it off."""
+        with self._lock:
+            if self._span_log is not None:
+                self._span_log.close()
+            self._span_log = open(path, "a", buffering=1) if path else None
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def export_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for (name, _), _ in values}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (value_name, labels), value in values:
+                    if value_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (histogram_name, labels), histogram in histograms:
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return all metrics as plain data, with p50/p95/p99 estimates per histogram."""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+        return {
+            "timestamp": time.time(),
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters],
+            "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                       for (name, labels), value in gauges],
+            "histograms": [{"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                            "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                           for (name, labels), h in histograms],
+        }
+
+    def write_jsonl(self, path):
+        """Append one JSON line with the current metrics snapshot, for a local collector to tail."""
+        with open(path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+STAGE_METRIC = "sar_stage_duration_seconds"
+EXTERNAL_METRIC = "sar_external_calls_total"
+CACHE_METRIC = "sar_cache_requests_total"
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block of code as one stage of the agent path."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        registry.observe(STAGE_METRIC, duration, stage=stage, **labels)
+        registry.log_span({"ts": time.time(), "stage": stage, "duration_ms": duration * 1000, **labels})
+
+
+@contextmanager
+def external_call(service):
+    """Time a call to an external service and count it as ok or error."""
+    outcome = "error"
+    try:
+        with span(service):
+            yield
+        outcome = "ok"
+    finally:
+        registry.increment(EXTERNAL_METRIC, service=service, outcome=outcome)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_cache(cache, hit):
+    registry.increment(CACHE_METRIC, cache=cache, result="hit" if hit else "miss")
+
+
+def export_prometheus():
+    return registry.export_prometheus()
+
+
+def write_jsonl(path):
+    registry.write_jsonl(path)
+
+
+def set_span_log(path):
+    registry.set_span_log(path)
+
+
+class SessionProfiler:
+    def __init__(self):
+        """
+        cProfile hook that can be switched on for individual sessions.
+
+        Profiled work is serialized process-wide: from Python 3.12 cProfile allows only one
+        active profiler at a time, so blocks for different sessions never overlap. Sessions
+        without profiling are not affected.
+        """
+        self.sessions = {}
+        self._lock = threading.Lock()
+        # Reentrant so a profiled block that calls into another cannot deadlock itself
+        self._active = threading.RLock()
+
+    def enable(self, session_id, output_dir="profiles"):
+        """Profile every instrumented request for a session, writing .prof files to output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        with self._lock:
+            self.sessions[session_id] = output_dir
+
+    def disable(self, session_id):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    @contextmanager
+    def profile(self, session_id, label):
+        """Run the block under cProfile if profiling is enabled for the session."""
+        with self.collect(session_id, label) as profiler:
+            if profiler is None:
+                yield None
+                return
+            with self._active:
+                profiler.enable()
+                try:
+                    yield profiler
+                finally:
+                    profiler.disable()
+
+    @contextmanager
+    def collect(self, session_id, label):
+        """
+        Yield a cProfile.Profile, or None if profiling is off, and write one .prof file when the block exits.
+
+        Unlike profile() the profiler is not switched on in the calling thread; each blocking
+        step is passed to run(), e.g. from the worker threads of an async handler.
+        """
+        output_dir = self.sessions.get(session_id)
+        if output_dir is None:
+            yield None
+            return
+        profiler = cProfile.Profile()
+        try:
+            yield profiler
+        finally:
+            filename = f"{session_id}-{label}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6}.prof"
+            profiler.dump_stats(os.path.join(output_dir, filename))
+
+    def run(self, profiler, func, *args):
+        """Call func under a profiler from collect(), in the calling thread, once no other profiled work is running."""
+        with self._active:
+            profiler.enable()
+            try:
+                return func(*args)
+            finally:
+                profiler.disable()
+
+
+profiler = SessionProfiler()
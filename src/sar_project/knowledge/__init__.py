@@ -1,3 +1,6 @@
 from .knowledge_base import KnowledgeBase
+from .event_log import EventLog, MissionEvent
+from .resource_store import ResourceStore
+from .spatial_index import SpatialIndex
 
-__all__ = ["KnowledgeBase"]
\ No newline at end of file
+__all__ = ["KnowledgeBase", "EventLog", "MissionEvent", "ResourceStore", "SpatialIndex"]
\ No newline at end of file
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sar_project.instrumentation import count_cache
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl=300, max_size=1024, name=None):
+        """
+        Thread-safe LRU cache whose entries expire after a fixed time to live.
+
+        Args:
+            ttl (float): Seconds an entry stays valid.
+            max_size (int): Entries kept before the least recently used is dropped.
+            name (str): If given, hits and misses are exported as metrics under this name.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the cached value, or `default` if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            hit = entry is not _MISSING and entry[0] > time.monotonic()
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+        if self.name is not None:
+            count_cache(self.name, hit)
+        return entry[1] if hit else default
+
+    def set(self, key, value, ttl=None):
+        """Stores a value, optionally with its own time to live."""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute, ttl=None):
+        """
+        Returns the cached value, computing and storing it on a miss.
+
+        Args:
+            key: Cache key.
+            compute (callable): Called with no arguments to produce the value.
+            ttl (float): Optional time to live for a newly computed value.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """Drops one entry, or everything if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,199 @@
+import argparse
+import time
+
+import numpy as np
+
+from sar_project.config import settings
+
+BATCH_SIZE_CANDIDATES = (8, 16, 32, 64, 128)
+
+# Representative protocol questions and passages, used to tune and compare when no corpus is given
+SAMPLE_TEXTS = [
+    "How many chest compressions per minute during CPR?",
+    "Apply a tourniquet two to three inches above the wound, not over a joint.",
+    "Signs of hypothermia include shivering, confusion, slurred speech and drowsiness.",
+    "How do I treat a suspected broken leg in the backcountry?",
+    "Keep the patient still and support the head and neck if a spinal injury is suspected.",
+    "What should I do for a snake bite?",
+    "Heat stroke is a medical emergency; cool the person rapidly with water and fanning.",
+    "Place an unconscious breathing patient in the recovery position and monitor their airway.",
+    "Rinse a chemical burn with cool running water for at least twenty minutes.",
+    "Symptoms of altitude sickness are headache, nausea, dizziness and shortness of breath.",
+    "Press firmly on a bleeding wound with a clean cloth and do not remove soaked dressings.",
+    "How to recognize a stroke: face drooping, arm weakness, speech difficulty, time to call.",
+]
+
+
+class CPUEmbedder:
+    def __init__(self, model_name=settings.EMBEDDING_MODEL, model=None, quantize=True, threads=None,
+                 batch_size=None, tune_texts=None):
+        """
+        SentenceTransformer wrapper tuned for CPU-only field hardware.
+
+        Args:
+            model_name (str): SentenceTransformer model to load when `model` is not given.
+            model: Already loaded model with a SentenceTransformer-style encode().
+            quantize (bool): Convert the model's Linear layers to dynamic int8.
+            threads (int): Torch intra-op threads; None keeps the torch default.
+            batch_size (int): Texts per forward pass; None tunes it here, so queries never wait for tuning.
+            tune_texts (list): Sample texts to tune on; the built-in samples are used if None.
+        """
+        import torch
+
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device="cpu")
+        if threads:
+            torch.set_num_threads(threads)
+        if quantize and isinstance(model, torch.nn.Module):
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.quantized = quantize and isinstance(model, torch.nn.Module)
+        self.threads = torch.get_num_threads()
+        self.batch_size = batch_size
+        if batch_size is None:
+            self.autotune(tune_texts)
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        """
+        Embed one string or a list of strings, returning a float32 array like SentenceTransformer.
+
+        Texts are sorted by length before batching so each batch pads to similar lengths,
+        and the results are returned in the original order.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch = self._encode_batch([texts[i] for i in indices])
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[indices] = batch
+        if vectors is None:
+            vectors = np.empty((0, 0), dtype=np.float32)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+    def autotune(self, texts=None, candidates=BATCH_SIZE_CANDIDATES):
+        """
+        Pick the batch size with the best throughput on this machine.
+
+        Candidates are tried in increasing order and tuning stops once throughput falls
+        clearly below the best seen, since larger batches will not recover.
+
+        Args:
+            texts (list): Sample texts; the built-in samples are used when too few are given.
+            candidates (tuple): Batch sizes to try.
+
+        Returns:
+            int: The chosen batch size.
+        """
+        sample = list(texts or [])
+        if len(sample) < len(SAMPLE_TEXTS):
+            sample += SAMPLE_TEXTS
+        sample = sorted(sample, key=len)
+        # Warm up so the first measurement does not include one-off allocation costs
+        self._encode_batch(sample[:candidates[0]])
+
+        best_size, best_rate = candidates[0], 0.0
+        for size in candidates:
+            batch = (sample * (size // len(sample) + 1))[:size]
+            start = time.perf_counter()
+            self._encode_batch(batch)
+            rate = size / max(time.perf_counter() - start, 1e-9)
+            if rate > best_rate:
+                best_size, best_rate = size, rate
+            elif rate < best_rate * 0.9:
+                break
+        self.batch_size = best_size
+        return best_size
+
+    def _encode_batch(self, texts):
+        vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_local_embedder(model_name=settings.EMBEDDING_MODEL, mode=settings.EMBEDDING_MODE):
+    """Load the embedding model in this process, in CPU mode if configured."""
+    if mode == "cpu":
+        return CPUEmbedder(model_name, quantize=settings.EMBEDDING_QUANTIZE,
+                           threads=settings.EMBEDDING_THREADS, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def compare_embedders(baseline, candidate, texts=SAMPLE_TEXTS, repeats=3):
+    """
+    Compare a candidate embedder with the baseline on accuracy and throughput.
+
+    Accuracy is reported as the cosine similarity between the two embeddings of each
+    text, and as how often both embedders agree on each text's nearest neighbour,
+    which is what retrieval depends on.
+
+    Args:
+        baseline: Reference embedder, usually the default SentenceTransformer.
+        candidate: Embedder to evaluate, e.g. a CPUEmbedder.
+        texts (list): Texts to embed.
+        repeats (int): Timed passes over the texts per embedder.
+
+    Returns:
+        dict: Throughput in texts/second for each, speedup, cosine stats and neighbour agreement.
+    """
+    results = {}
+    embeddings = {}
+    for name, embedder in (("baseline", baseline), ("candidate", candidate)):
+        embeddings[name] = np.asarray(embedder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            embedder.encode(texts)
+        results[f"{name}_texts_per_sec"] = len(texts) * repeats / max(time.perf_counter() - start, 1e-9)
+
+    cosine = np.sum(embeddings["baseline"] * embeddings["candidate"], axis=1)
+    neighbours = {}
+    for name, vectors in embeddings.items():
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        neighbours[name] = similarity.argmax(axis=1)
+
+    results["speedup"] = results["candidate_texts_per_sec"] / results["baseline_texts_per_sec"]
+    results["mean_cosine"] = float(cosine.mean())
+    results["min_cosine"] = float(cosine.min())
+    results["neighbour_agreement"] = float(np.mean(neighbours["baseline"] == neighbours["candidate"]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU embedding mode with the default model.")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--texts", help="File with one text per line; defaults to built-in samples")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS)
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    from sentence_transformers import SentenceTransformer
+    baseline = SentenceTransformer(args.model, device="cpu")
+    candidate = CPUEmbedder(args.model, quantize=not args.no_quantize, threads=args.threads, tune_texts=texts)
+
+    results = compare_embedders(baseline, candidate, texts, repeats=args.repeats)
+    print(f"Texts: {len(texts)}  threads: {candidate.threads}  batch size: {candidate.batch_size}  "
+          f"quantized: {candidate.quantized}")
+    print(f"Baseline:  {results['baseline_texts_per_sec']:.1f} texts/s")
+    print(f"CPU mode:  {results['candidate_texts_per_sec']:.1f} texts/s ({results['speedup']:.2f}x)")
+    print(f"Cosine to baseline: mean {results['mean_cosine']:.4f}, min {results['min_cosine']:.4f}")
+    print(f"Nearest-neighbour agreement: {results['neighbour_agreement']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sar_project.config import settings
+from sar_project.knowledge.cpu_embedder import load_local_embedder
+from sar_project.instrumentation import external_call, registry
+
+# Frames are a 4-byte big-endian length followed by that many bytes
+_LENGTH = struct.Struct("!I")
+
+
+class EmbeddingServer:
+    def __init__(self, socket_path, model=None, model_name=settings.EMBEDDING_MODEL, max_batch=64, max_wait_ms=5):
+        """
+        Serves one embedding model to every worker process over a Unix socket.
+
+        Requests that arrive within `max_wait_ms` of each other are merged into one
+        encode call of up to `max_batch` texts, so many workers share one model and
+        one copy of its weights.
+
+        Args:
+            socket_path (str): Path of the Unix socket to listen on.
+            model: Object with a SentenceTransformer-style encode(); loaded from model_name if None.
+            model_name (str): SentenceTransformer model to load, in CPU mode if configured.
+            max_batch (int): Most texts merged into one encode call.
+            max_wait_ms (float): Longest a request waits for others to join its batch.
+        """
+        if model is None:
+            model = load_local_embedder(model_name)
+        self.socket_path = socket_path
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        # A single thread keeps encode calls serialized on the one model
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-server")
+
+    async def serve(self, ready=None):
+        """Listen until cancelled. `ready` (threading.Event) is set once the socket accepts connections."""
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                length = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))[0]
+                request = json.loads(await reader.readexactly(length))
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put((request["texts"], future))
+                try:
+                    vectors = await future
+                except Exception as e:
+                    self._write_frame(writer, json.dumps({"error": str(e)}).encode("utf-8"))
+                else:
+                    header = json.dumps({"shape": vectors.shape, "dtype": "float32"}).encode("utf-8")
+                    self._write_frame(writer, header)
+                    # Rows of a C-contiguous array are contiguous, so this sends without copying
+                    writer.write(memoryview(vectors).cast("B"))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_frame(writer, payload):
+        writer.write(_LENGTH.pack(len(payload)))
+        writer.write(payload)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            registry.observe("sar_embedding_batch_size", len(texts))
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def _encode(self, texts):
+        vectors = self.model.encode(texts, convert_to_numpy=True)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+class RemoteEmbedder:
+    def __init__(self, socket_path, timeout=30):
+        """
+        Client for EmbeddingServer with the same encode() signature as SentenceTransformer.
+
+        Each thread keeps its own connection, so it is safe to share between threads.
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        """Embed one string or a list of strings; returns a float32 array like SentenceTransformer."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        with external_call("embedding_server"):
+            try:
+                vectors = self._request(texts)
+            except OSError:
+                # The server may have restarted; reconnect once
+                self._close()
+                vectors = self._request(texts)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+    def ping(self):
+        """Return True if the server accepts connections."""
+        try:
+            self._connection()
+            return True
+        except OSError:
+            return False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _request(self, texts):
+        conn = self._connection()
+        payload = json.dumps({"texts": texts}).encode("utf-8")
+        conn.sendall(_LENGTH.pack(len(payload)) + payload)
+        header = json.loads(self._receive(conn, _LENGTH.unpack(self._receive(conn, _LENGTH.size))[0]))
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        rows, dims = header["shape"]
+        # The array is a view over the receive buffer, so the vectors are not copied again
+        return np.frombuffer(self._receive(conn, rows * dims * 4), dtype=np.float32).reshape(rows, dims)
+
+    @staticmethod
+    def _receive(conn, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = conn.recv_into(view[received:])
+            if not count:
+                raise ConnectionError("Embedding server closed the connection")
+            received += count
+        return buffer
+
+
+def load_embedder(socket_path=settings.EMBEDDING_SOCKET, model_name=settings.EMBEDDING_MODEL):
+    """
+    Return the shared embedding server client if one is configured and running,
+    otherwise load the model in this process.
+    """
+    if socket_path:
+        remote = RemoteEmbedder(socket_path)
+        if remote.ping():
+            return remote
+        warnings.warn(f"Embedding server at {socket_path} is not reachable; loading {model_name} locally")
+    return load_local_embedder(model_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one embedding model to all agent workers.")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SOCKET or "/tmp/sar-embeddings.sock")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    server = EmbeddingServer(args.socket, model_name=args.model, max_batch=args.max_batch,
+                             max_wait_ms=args.max_wait_ms)
+    print(f"Serving {args.model} on {args.socket}")
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+COLD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    event_type TEXT,
+    team TEXT,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_time ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_by_type ON events (event_type, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_team ON events (team, timestamp);
+"""
+
+
+def _encode_value(value):
+    """json.dumps hook: datetimes become ISO strings; anything else that is not JSON is rejected."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Mission event values must be JSON serializable, got {type(value).__name__}")
+
+
+def _to_epoch(value):
+    """Converts a timestamp given as epoch seconds, datetime or ISO string to epoch seconds."""
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class MissionEvent:
+    __slots__ = ("seq", "timestamp", "event_type", "team", "details", "payload")
+
+    def __init__(self, seq, timestamp, event_type, team, details, payload=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.event_type = event_type
+        self.team = team
+        self.details = details
+        # details as JSON, kept so spilling to the cold tier does not encode it again
+        self.payload = payload
+
+    @classmethod
+    def from_dict(cls, seq, event):
+        """Builds an event from a logged dict, reading its timestamp, type and team fields."""
+        return cls(
+            seq,
+            _to_epoch(event.get("timestamp")),
+            event.get("event_type", event.get("type", event.get("action"))),
+            event.get("team"),
+            event,
+        )
+
+    def __repr__(self):
+        return f"MissionEvent(seq={self.seq}, timestamp={self.timestamp}, type={self.event_type!r}, team={self.team!r})"
+
+
+class _RingView:
+    """Sequence view over the ring buffer in logical (oldest first) order, for bisect."""
+    __slots__ = ("log", "column")
+
+    def __init__(self, log, column):
+        self.log = log
+        self.column = column
+
+    def __len__(self):
+        return self.log._count
+
+    def __getitem__(self, i):
+        return self.column[(self.log._head + i) % self.log.hot_capacity]
+
+
+class EventLog:
+    def __init__(self, hot_capacity=10000, spill_batch=1000, spill_path=None):
+        """
+        Bounded, time-indexed mission event log.
+
+        Recent events live in a fixed-size in-memory ring buffer with per-type and
+        per-team indexes. When the ring fills, the oldest `spill_batch` events are
+        written to an indexed SQLite cold tier, so memory stays bounded and no
+        history is lost.
+
+        Args:
+            hot_capacity (int): Number of events kept in memory.
+            spill_batch (int): Number of events moved to the cold tier at once.
+            spill_path (str): SQLite file for the cold tier. A temporary file is
+                created on first spill if not given, and removed by close().
+        """
+        self.hot_capacity = hot_capacity
+        self.spill_batch = min(spill_batch, hot_capacity)
+        self.spill_path = spill_path
+        self._temporary_spill = False
+        self._events = [None] * hot_capacity
+        # Highest timestamp seen up to each slot; nondecreasing, so it can be bisected
+        self._watermarks = [0.0] * hot_capacity
+        self._head = 0
+        self._count = 0
+        self._next_seq = 0
+        self._max_watermark = float("-inf")
+        # Largest amount by which an event arrived older than the newest one before it
+        self._max_lateness = 0.0
+        self._by_type = {}
+        self._by_team = {}
+        self._cold = None
+        self._cold_count = 0
+        self._cold_max_timestamp = float("-inf")
+
+    def append(self, event):
+        """
+        Logs an event.
+
+        The details are stored as their JSON round trip, so events read back from the
+        cold tier look exactly like recent ones: datetimes become ISO strings and
+        tuples become lists.
+
+        Args:
+            event (dict): Event details. "timestamp" (epoch seconds, datetime or ISO
+                string; defaults to now), "event_type" (or "type"/"action") and "team"
+                are indexed when present.
+
+        Returns:
+            MissionEvent: The stored event.
+
+        Raises:
+            TypeError: If the event holds a value that cannot be stored as JSON.
+        """
+        payload = json.dumps(event, default=_encode_value)
+        if self._count == self.hot_capacity:
+            self._spill()
+
+        record = MissionEvent.from_dict(self._next_seq, json.loads(payload))
+        record.payload = payload
+        self._next_seq += 1
+        if record.timestamp < self._max_watermark:
+            self._max_lateness = max(self._max_lateness, self._max_watermark - record.timestamp)
+        self._max_watermark = max(self._max_watermark, record.timestamp)
+
+        slot = (self._head + self._count) % self.hot_capacity
+        self._events[slot] = record
+        self._watermarks[slot] = self._max_watermark
+        self._count += 1
+        self._by_type.setdefault(record.event_type, deque()).append(record.seq)
+        self._by_team.setdefault(record.team, deque()).append(record.seq)
+        return record
+
+    def query(self, start=None, end=None, event_type=None, team=None):
+        """
+        Returns events with start <= timestamp < end, optionally filtered by type and team.
+
+        Args:
+            start (float): Inclusive lower bound in epoch seconds, or None for no bound.
+            end (float): Exclusive upper bound in epoch seconds, or None for no bound.
+            event_type (str): Only return events of this type.
+            team (str): Only return events for this team.
+
+        Returns:
+            list: Matching MissionEvent objects in the order they were logged.
+        """
+        events = []
+        if self._cold is not None and (start is None or start <= self._cold_max_timestamp):
+            events.extend(self._query_cold(start, end, event_type, team))
+        events.extend(self._query_hot(start, end, event_type, team))
+        return events
+
+    def recent(self, seconds, event_type=None, team=None, now=None):
+        """Returns events from the last `seconds` seconds, e.g. events for team X in the last 10 minutes."""
+        now = time.time() if now is None else now
+        return self.query(start=now - seconds, event_type=event_type, team=team)
+
+    def _query_hot(self, start, end, event_type, team):
+        if not self._count:
+            return []
+        watermarks = _RingView(self, self._watermarks)
+        lo = 0 if start is None else bisect_left(watermarks, start)
+        hi = self._count
+        if end is not None:
+            # Anything past this point is at least `end` even if it arrived late
+            hi = bisect_left(watermarks, end + self._max_lateness, lo)
+        first_seq = self._events[self._head].seq
+        lo_seq, hi_seq = first_seq + lo, first_seq + hi
+
+        if team is not None or event_type is not None:
+            index = self._by_team.get(team) if team is not None else self._by_type.get(event_type)
+            seqs = []
+            # Walk the index backwards so recent-window queries only touch recent entries
+            for seq in reversed(index or ()):
+                if seq < lo_seq:
+                    break
+                if seq < hi_seq:
+                    seqs.append(seq)
+            seqs.reverse()
+        else:
+            seqs = range(lo_seq, hi_seq)
+
+        matches = []
+        for seq in seqs:
+            event = self._events[(self._head + seq - first_seq) % self.hot_capacity]
+            if start is not None and event.timestamp < start:
+                continue
+            if end is not None and event.timestamp >= end:
+                continue
+            if event_type is not None and event.event_type != event_type:
+                continue
+            matches.append(event)
+        return matches
+
+    def _spill(self):
+        if self._cold is None:
+            if self.spill_path is None:
+                fd, self.spill_path = tempfile.mkstemp(prefix="mission_events_", suffix=".db")
+                os.close(fd)
+                self._temporary_spill = True
+            self._cold = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._cold.execute("PRAGMA journal_mode=WAL")
+            self._cold.executescript(COLD_SCHEMA)
+
+        batch = []
+        for _ in range(self.spill_batch):
+            event = self._events[self._head]
+            self._events[self._head] = None
+            self._head = (self._head + 1) % self.hot_capacity
+            self._count -= 1
+            self._unindex(self._by_type, event.event_type)
+            self._unindex(self._by_team, event.team)
+            self._cold_max_timestamp = max(self._cold_max_timestamp, event.timestamp)
+            batch.append((event.seq, event.timestamp, event.event_type, event.team, event.payload))
+        with self._cold:
+            self._cold.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", batch)
+        self._cold_count += len(batch)
+
+    def _query_cold(self, start, end, event_type, team):
+        clauses, params = [], []
+        for column, op, value in (("timestamp", ">=", start), ("timestamp", "<", end),
+                                  ("event_type", "=", event_type), ("team", "=", team)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._cold.execute(
+            f"SELECT seq, timestamp, event_type, team, details FROM events {where} ORDER BY seq",
+            params,
+        )
+        return [MissionEvent(seq, ts, kind, team_name, json.loads(details), details)
+                for seq, ts, kind, team_name, details in rows]
+
+    def close(self):
+        """Closes the cold tier, deleting its file if the log created it as a temporary file."""
+        if self._cold is not None:
+            self._cold.close()
+            self._cold = None
+        if self._temporary_spill:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.spill_path + suffix):
+                    os.remove(self.spill_path + suffix)
+            self._temporary_spill = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _unindex(index, key):
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+    def __len__(self):
+        return self._cold_count + self._count
+
+    def __iter__(self):
+        return iter(self.query())
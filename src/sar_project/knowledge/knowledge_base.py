@@ -1,33 +1,48 @@
+from sar_project.knowledge.event_log import EventLog
+from sar_project.knowledge.resource_store import ResourceStore
+from sar_project.knowledge.spatial_index import SpatialIndex, parse_coordinates
+
+
 class KnowledgeBase:
-    def __init__(self):
+    def __init__(self, event_log=None):
         """
         Initializes the knowledge base with empty datasets for terrain, weather,
         resources, and mission history.
+
+        Args:
+            event_log (EventLog): Optional preconfigured mission event log, e.g. with
+                a larger hot tier or a persistent spill file.
         """
         self.terrain_data = {}
         self.weather_data = {}
-        self.resource_status = {}
-        self.mission_history = []
+        self.terrain_index = SpatialIndex()
+        self.weather_index = SpatialIndex()
+        self.resource_status = ResourceStore()
+        self.mission_history = event_log if event_log is not None else EventLog()
 
     def update_terrain(self, location, data):
         """
         Updates terrain data for a specific location.
 
         Args:
-            location (str): Name or identifier of the location.
+            location (str): Name or identifier of the location. A "lat,lon" string
+                or (lat, lon) tuple is also indexed for spatial queries.
             data (dict): Terrain-related data (e.g., elevation, obstacles).
         """
         self.terrain_data[location] = data
+        self._index_location(self.terrain_index, location)
 
     def update_weather(self, location, conditions):
         """
         Updates weather data for a specific location.
 
         Args:
-            location (str): Name or identifier of the location.
+            location (str): Name or identifier of the location. A "lat,lon" string
+                or (lat, lon) tuple is also indexed for spatial queries.
             conditions (dict): Weather conditions (e.g., temperature, wind speed).
         """
         self.weather_data[location] = conditions
+        self._index_location(self.weather_index, location)
 
     def update_resource_status(self, resource_name, status):
         """
@@ -37,14 +52,38 @@ class KnowledgeBase:
             resource_name (str): Name of the resource (e.g., drone, vehicle).
             status (dict): Resource status (e.g., availability, location).
         """
-        self.resource_status[resource_name] = status
+        self.resource_status.update(resource_name, status)
+
+    def update_resource_statuses(self, updates):
+        """
+        Updates the status of many resources in one batch, e.g. a telemetry frame.
+
+        Args:
+            updates (iterable): (resource_name, status) or (resource_name, status, timestamp) tuples.
+        """
+        self.resource_status.update_many(updates)
+
+    def subscribe_resource_changes(self, callback, resources=None, fields=None):
+        """
+        Registers a callback for resource status changes instead of polling.
+
+        Args:
+            callback (callable): Receives a ResourceChange for each matching update.
+            resources (iterable): Only these resources; all if None.
+            fields (iterable): Only changes touching one of these status fields; all if None.
+
+        Returns:
+            Subscription: Call cancel() on it to unsubscribe.
+        """
+        return self.resource_status.subscribe(callback, resources, fields)
 
     def log_mission_event(self, event):
         """
         Logs an event in the mission history.
 
         Args:
-            event (dict): Event details (e.g., timestamp, action, outcome).
+            event (dict): Event details (e.g., timestamp, action, outcome). The
+                timestamp, event_type (or action) and team fields are indexed.
         """
         self.mission_history.append(event)
 
@@ -72,6 +111,84 @@ class KnowledgeBase:
         """
         return self.weather_data.get(location, {})
 
+    def query_terrain_nearest(self, lat, lon, k=1, max_distance_km=None):
+        """
+        Retrieves terrain data for the sampled points closest to a coordinate.
+
+        Args:
+            lat (float): Latitude of the query point.
+            lon (float): Longitude of the query point.
+            k (int): Number of points to return.
+            max_distance_km (float): Ignore points further away than this.
+
+        Returns:
+            list: Dicts with "location", "distance_km" and "data", closest first.
+        """
+        return self._nearest(self.terrain_index, self.terrain_data, lat, lon, k, max_distance_km)
+
+    def query_terrain_area(self, south, west, north, east):
+        """
+        Retrieves terrain data for every sampled point inside a bounding box.
+
+        Returns:
+            dict: Terrain data keyed by location.
+        """
+        return {location: self.terrain_data[location]
+                for location in self.terrain_index.within_bbox(south, west, north, east)}
+
+    def query_terrain_corridor(self, path, width_km):
+        """
+        Retrieves terrain data along a route or search sector line.
+
+        Args:
+            path (list): (lat, lon) vertices of the path.
+            width_km (float): Half-width of the corridor in kilometres.
+
+        Returns:
+            dict: Terrain data keyed by location, closest to the path first.
+        """
+        return {location: self.terrain_data[location]
+                for _, location in self.terrain_index.along_corridor(path, width_km)}
+
+    def query_weather_nearest(self, lat, lon, k=1, max_distance_km=None):
+        """
+        Retrieves weather data for the sampled points closest to a coordinate.
+
+        Args:
+            lat (float): Latitude of the query point.
+            lon (float): Longitude of the query point.
+            k (int): Number of points to return.
+            max_distance_km (float): Ignore points further away than this.
+
+        Returns:
+            list: Dicts with "location", "distance_km" and "data", closest first.
+        """
+        return self._nearest(self.weather_index, self.weather_data, lat, lon, k, max_distance_km)
+
+    def query_weather_area(self, south, west, north, east):
+        """
+        Retrieves weather data for every sampled point inside a bounding box.
+
+        Returns:
+            dict: Weather data keyed by location.
+        """
+        return {location: self.weather_data[location]
+                for location in self.weather_index.within_bbox(south, west, north, east)}
+
+    def query_weather_corridor(self, path, width_km):
+        """
+        Retrieves weather data along a route or search sector line.
+
+        Args:
+            path (list): (lat, lon) vertices of the path.
+            width_km (float): Half-width of the corridor in kilometres.
+
+        Returns:
+            dict: Weather data keyed by location, closest to the path first.
+        """
+        return {location: self.weather_data[location]
+                for _, location in self.weather_index.along_corridor(path, width_km)}
+
     def query_resource_status(self, resource_name):
         """
         Retrieves the status of a resource.
@@ -82,7 +199,7 @@ class KnowledgeBase:
         Returns:
             dict: Resource status or an empty dictionary if not found.
         """
-        return self.resource_status.get(resource_name, {})
+        return self.resource_status.get(resource_name)
 
     def get_mission_history(self):
         """
@@ -91,4 +208,44 @@ class KnowledgeBase:
         Returns:
             list: A list of logged mission events.
         """
-        return self.mission_history
+        return [event.details for event in self.mission_history]
+
+    def query_mission_events(self, start=None, end=None, event_type=None, team=None):
+        """
+        Retrieves mission events in a time range, optionally filtered by type and team.
+
+        Args:
+            start (float): Inclusive lower bound in epoch seconds, or None.
+            end (float): Exclusive upper bound in epoch seconds, or None.
+            event_type (str): Only return events of this type.
+            team (str): Only return events for this team.
+
+        Returns:
+            list: Matching mission events.
+        """
+        return [event.details for event in self.mission_history.query(start, end, event_type, team)]
+
+    def get_recent_mission_events(self, seconds, event_type=None, team=None):
+        """
+        Retrieves mission events from the last `seconds` seconds.
+
+        Args:
+            seconds (float): Size of the window ending now.
+            event_type (str): Only return events of this type.
+            team (str): Only return events for this team.
+
+        Returns:
+            list: Matching mission events.
+        """
+        return [event.details for event in self.mission_history.recent(seconds, event_type, team)]
+
+    @staticmethod
+    def _index_location(index, location):
+        coordinates = parse_coordinates(location)
+        if coordinates is not None:
+            index.insert(location, *coordinates)
+
+    @staticmethod
+    def _nearest(index, data, lat, lon, k, max_distance_km):
+        return [{"location": location, "distance_km": distance, "data": data[location]}
+                for distance, location in index.nearest(lat, lon, k, max_distance_km)]
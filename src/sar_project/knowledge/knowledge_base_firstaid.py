@@ -1,22 +1,32 @@
+import copy
 import json
 import os
+import time
 import pdfplumber
 import chromadb
-from sentence_transformers import SentenceTransformer
+from sar_project.instrumentation import span
+from sar_project.knowledge.embedding_service import load_embedder
 
 METADATA_FILE = "./Documents/processed_pdfs.json"
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Uses the shared embedding server when SAR_EMBEDDING_SOCKET points at a running one
+embedder = load_embedder()
 
 chroma_client = chromadb.PersistentClient(path="../knowledge/rag_database")
 collection = chroma_client.get_or_create_collection(name="firstaid_knowledge")
 
 class KnowledgeBase:
-    def __init__(self):
+    # Per-session rescue state. The embedder and ChromaDB collection above are
+    # module-level and shared by every session, so instances stay small.
+    __slots__ = ("session_id", "data", "lat", "lon", "nearest_hospital", "hospital_location",
+                 "weather", "chat_history", "last_active", "__weakref__")
+
+    def __init__(self, session_id=None):
         """
         Initializes the knowledge base with empty datasets for terrain, weather,
         resources, and chat history.
         """
+        self.session_id = session_id
         self.data = {
             "rescuee_location": "Location Data: ",
             "rescue_weather": "Weather Data: ",
@@ -26,13 +36,57 @@ class KnowledgeBase:
         self.lat = None
         self.lon = None
         self.nearest_hospital = None
+        # (lat, lon) of nearest_hospital, so maps need not parse the description
+        self.hospital_location = None
         self.weather = ''
         self.chat_history = []
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        """Mark the session as active now."""
+        self.last_active = time.monotonic()
+
+    def has_location(self):
+        """Return True once the rescuer's coordinates are known."""
+        return self.lat is not None and self.lon is not None
+
+    def to_dict(self):
+        """Return the session state as plain data, suitable for JSON snapshots."""
+        return {
+            "session_id": self.session_id,
+            "data": self.data,
+            "lat": self.lat,
+            "lon": self.lon,
+            "nearest_hospital": self.nearest_hospital,
+            "hospital_location": self.hospital_location,
+            "weather": self.weather,
+            "chat_history": self.chat_history,
+        }
+
+    def snapshot(self):
+        """Return an independent copy of the session state for read-only use elsewhere."""
+        return KnowledgeBase.from_dict(copy.deepcopy(self.to_dict()))
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a session from the output of to_dict()."""
+        kb = cls(state["session_id"])
+        kb.data = state["data"]
+        kb.lat = state["lat"]
+        kb.lon = state["lon"]
+        kb.nearest_hospital = state["nearest_hospital"]
+        location = state.get("hospital_location")
+        kb.hospital_location = tuple(location) if location else None
+        kb.weather = state["weather"]
+        kb.chat_history = state["chat_history"]
+        return kb
 
     # Searches through chromaDB for relevant information
     def retrieve_relevant_text(self, input, top_k=1):
-        query_embedding = embedder.encode([input]).tolist()[0]
-        results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
+        with span("embed"):
+            query_embedding = embedder.encode([input]).tolist()[0]
+        with span("vector_query"):
+            results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
 
         # Return the first set of retrieved documents if available
         return str(results['documents'][0]) if results.get('documents') else ""
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+_MISSING = object()
+
+
+class ResourceRecord:
+    __slots__ = ("name", "version", "timestamp", "status", "recent", "downsampled")
+
+    def __init__(self, name, recent_size, downsampled_size):
+        self.name = name
+        self.version = 0
+        self.timestamp = None
+        self.status = {}
+        # Every recent update, then one sample per downsample interval for older history
+        self.recent = deque(maxlen=recent_size)
+        self.downsampled = deque(maxlen=downsampled_size)
+
+
+class ResourceChange:
+    __slots__ = ("resource", "version", "timestamp", "changed", "status")
+
+    def __init__(self, resource, version, timestamp, changed, status):
+        self.resource = resource
+        self.version = version
+        self.timestamp = timestamp
+        self.changed = changed
+        self.status = status
+
+    def __repr__(self):
+        return f"ResourceChange({self.resource!r}, version={self.version}, changed={sorted(self.changed)})"
+
+
+class Subscription:
+    def __init__(self, store, callback, resources, fields):
+        self.store = store
+        self.callback = callback
+        self.resources = frozenset(resources) if resources is not None else None
+        self.fields = frozenset(fields) if fields is not None else None
+
+    def matches(self, change):
+        return self.fields is None or not self.fields.isdisjoint(change.changed)
+
+    def cancel(self):
+        """Stops delivering changes to this subscription."""
+        self.store._unsubscribe(self)
+
+
+class ResourceWatch:
+    """Async iterator over resource changes, fed from any thread."""
+
+    def __init__(self, store, resources, fields, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.subscription = store.subscribe(self._push, resources, fields)
+
+    def _push(self, change):
+        self.loop.call_soon_threadsafe(self._put, change)
+
+    def _put(self, change):
+        if self.queue.full():
+            # A slow consumer only needs the latest state, so drop the oldest change
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(change)
+
+    def close(self):
+        self.subscription.cancel()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class ResourceStore:
+    def __init__(self, recent_size=64, downsample_interval=60, downsampled_size=1440):
+        """
+        Versioned store for high-rate resource telemetry with change subscriptions.
+
+        Args:
+            recent_size (int): Updates kept at full rate per resource.
+            downsample_interval (float): Seconds per downsampled history sample.
+            downsampled_size (int): Downsampled samples kept per resource (1440 at
+                60 seconds is one day).
+        """
+        self.recent_size = recent_size
+        self.downsample_interval = downsample_interval
+        self.downsampled_size = downsampled_size
+        self._records = {}
+        self._subscribers = {}
+        self._wildcard_subscribers = []
+        self._lock = threading.Lock()
+
+    def update(self, resource_name, status, timestamp=None, merge=False):
+        """
+        Records a status update for one resource.
+
+        Args:
+            resource_name (str): Name of the resource (e.g., drone, vehicle).
+            status (dict): Resource status (e.g., availability, location).
+            timestamp (float): Epoch seconds of the reading; defaults to now.
+            merge (bool): Merge into the previous status instead of replacing it.
+
+        Returns:
+            ResourceChange: The change, or None if nothing changed.
+        """
+        return self.update_many([(resource_name, status, timestamp)], merge=merge)[0]
+
+    def update_many(self, updates, merge=False):
+        """
+        Records a batch of status updates under a single lock acquisition.
+
+        Subscribers are notified after the whole batch is applied.
+
+        Args:
+            updates (iterable): (resource_name, status) or (resource_name, status, timestamp) tuples.
+            merge (bool): Merge into each previous status instead of replacing it.
+
+        Returns:
+            list: One ResourceChange (or None if unchanged) per update.
+        """
+        now = time.time()
+        changes = []
+        with self._lock:
+            for update in updates:
+                resource_name, status = update[0], update[1]
+                timestamp = update[2] if len(update) > 2 and update[2] is not None else now
+                changes.append(self._apply(resource_name, status, timestamp, merge))
+        self._dispatch(changes)
+        return changes
+
+    def get(self, resource_name):
+        """Returns a copy of the latest status of a resource, or an empty dict if unknown."""
+        record = self._records.get(resource_name)
+        # Copied so callers cannot change stored state without a version bump or notification
+        return dict(record.status) if record is not None else {}
+
+    def version(self, resource_name):
+        """Returns the number of changes recorded for a resource."""
+        record = self._records.get(resource_name)
+        return record.version if record is not None else 0
+
+    def history(self, resource_name, since=None):
+        """
+        Returns (timestamp, status) samples for a resource, oldest first.
+
+        Older samples are downsampled to one per downsample_interval; the most
+        recent updates are returned at full rate.
+        """
+        record = self._records.get(resource_name)
+        if record is None:
+            return []
+        with self._lock:
+            recent = list(record.recent)
+            first_recent = recent[0][0] if recent else float("inf")
+            samples = [sample for sample in record.downsampled if sample[0] < first_recent] + recent
+        if since is not None:
+            samples = [sample for sample in samples if sample[0] >= since]
+        return [(timestamp, dict(status)) for timestamp, status in samples]
+
+    def subscribe(self, callback, resources=None, fields=None):
+        """
+        Calls `callback(change)` for every matching change.
+
+        Callbacks run on the thread that recorded the update, so they should be quick.
+
+        Args:
+            callback (callable): Receives a ResourceChange.
+            resources (iterable): Only these resources; all if None.
+            fields (iterable): Only changes touching one of these status fields; all if None.
+
+        Returns:
+            Subscription: Call cancel() on it to unsubscribe.
+        """
+        subscription = Subscription(self, callback, resources, fields)
+        with self._lock:
+            if subscription.resources is None:
+                self._wildcard_subscribers = self._wildcard_subscribers + [subscription]
+            else:
+                for name in subscription.resources:
+                    self._subscribers[name] = self._subscribers.get(name, []) + [subscription]
+        return subscription
+
+    def watch(self, resources=None, fields=None, maxsize=1000):
+        """
+        Returns an async iterator of matching changes. Must be called from a running event loop.
+
+        Example:
+            async for change in store.watch(resources=["drone-1"], fields=["battery"]):
+                ...
+        """
+        return ResourceWatch(self, resources, fields, maxsize)
+
+    def _unsubscribe(self, subscription):
+        # Subscriber lists are replaced rather than mutated so dispatch can iterate without the lock
+        with self._lock:
+            if subscription.resources is None:
+                self._wildcard_subscribers = [s for s in self._wildcard_subscribers if s is not subscription]
+                return
+            for name in subscription.resources:
+                remaining = [s for s in self._subscribers.get(name, []) if s is not subscription]
+                if remaining:
+                    self._subscribers[name] = remaining
+                else:
+                    self._subscribers.pop(name, None)
+
+    def _apply(self, resource_name, status, timestamp, merge):
+        record = self._records.get(resource_name)
+        if record is None:
+            record = ResourceRecord(resource_name, self.recent_size, self.downsampled_size)
+            self._records[resource_name] = record
+
+        new_status = {**record.status, **status} if merge else dict(status)
+        changed = {field for field in new_status.keys() | record.status.keys()
+                   if new_status.get(field, _MISSING) != record.status.get(field, _MISSING)}
+        if not changed and record.version:
+            return None
+
+        record.version += 1
+        record.timestamp = timestamp
+        record.status = new_status
+        record.recent.append((timestamp, new_status))
+        bucket = timestamp - timestamp % self.downsample_interval
+        if record.downsampled and record.downsampled[-1][0] == bucket:
+            record.downsampled[-1] = (bucket, new_status)
+        else:
+            record.downsampled.append((bucket, new_status))
+        return ResourceChange(resource_name, record.version, timestamp, changed, dict(new_status))
+
+    def _dispatch(self, changes):
+        wildcard = self._wildcard_subscribers
+        for change in changes:
+            if change is None:
+                continue
+            for subscription in wildcard + self._subscribers.get(change.resource, []):
+                if subscription.matches(change):
+                    subscription.callback(change)
+
+    def __contains__(self, resource_name):
+        return resource_name in self._records
+
+    def __getitem__(self, resource_name):
+        return dict(self._records[resource_name].status)
+
+    def __len__(self):
+        return len(self._records)
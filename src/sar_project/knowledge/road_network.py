@@ -0,0 +1,366 @@
+import argparse
+import heapq
+import math
+import re
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+import numpy as np
+
+from sar_project.config import settings
+from sar_project.knowledge.spatial_index import EARTH_RADIUS_KM, KM_PER_DEGREE, haversine_km
+
+# Typical travel speeds in km/h per OSM highway class, used when a way has no usable maxspeed
+DEFAULT_SPEEDS = {
+    "motorway": 100, "motorway_link": 60,
+    "trunk": 80, "trunk_link": 50,
+    "primary": 65, "primary_link": 40,
+    "secondary": 55, "secondary_link": 35,
+    "tertiary": 45, "tertiary_link": 30,
+    "unclassified": 35, "residential": 30, "living_street": 10,
+    "service": 20, "road": 30, "track": 15,
+}
+# Speed over the straight gap between a point and the nearest road node (walking or carrying)
+OFFROAD_SPEED = 5
+# Grid cell size in degrees of the index used to snap points to road nodes (roughly 1 km)
+SNAP_CELL_SIZE = 0.01
+# Multiplier that packs a cell's (row, column) into one sortable int64 key
+_CELL_STRIDE = 1 << 32
+
+
+class RoadGraph:
+    def __init__(self, node_ids, lat, lon, indptr, targets, seconds, cell_keys=None, cell_nodes=None):
+        """
+        Road network in compressed sparse row form, weighted by travel time.
+
+        The outgoing edges of node i are targets[indptr[i]:indptr[i + 1]] with travel
+        times seconds[indptr[i]:indptr[i + 1]], so the whole graph is six flat arrays.
+        Nodes are also indexed by grid cell for snapping; the index is saved with the
+        graph, so loading a saved graph does not rebuild it.
+
+        Args:
+            node_ids (np.ndarray): OSM id of each node.
+            lat, lon (np.ndarray): Node coordinates.
+            indptr (np.ndarray): Offsets into targets/seconds, one more than the node count.
+            targets (np.ndarray): Destination node of each edge.
+            seconds (np.ndarray): Travel time of each edge in seconds.
+            cell_keys (np.ndarray): Sorted grid cell key of each node; built if None.
+            cell_nodes (np.ndarray): Nodes in the same order as cell_keys.
+        """
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.targets = targets
+        self.seconds = seconds
+        # Fastest edge speed in km/s, which keeps the A* heuristic admissible
+        self.max_speed = self._max_speed()
+        if cell_keys is None or cell_nodes is None:
+            cell_keys, cell_nodes = _cell_index(lat, lon)
+        self.cell_keys = cell_keys
+        self.cell_nodes = cell_nodes
+        self._cell_count = int(np.count_nonzero(np.diff(cell_keys))) + 1 if len(cell_keys) else 0
+        self._adjacency = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @classmethod
+    def from_edges(cls, nodes, edges):
+        """
+        Build a graph from node coordinates and directed edges.
+
+        Args:
+            nodes (dict): OSM id -> (lat, lon).
+            edges (list): (from_id, to_id, seconds) tuples.
+        """
+        node_ids = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+        position = {node_id: i for i, node_id in enumerate(node_ids.tolist())}
+        coords = np.array(list(nodes.values()), dtype=np.float64).reshape(-1, 2)
+        sources = np.array([position[a] for a, _, _ in edges], dtype=np.int32)
+        targets = np.array([position[b] for _, b, _ in edges], dtype=np.int32)
+        seconds = np.array([s for _, _, s in edges], dtype=np.float32)
+
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=indptr[1:])
+        return cls(node_ids, coords[:, 0], coords[:, 1], indptr, targets[order], seconds[order])
+
+    @classmethod
+    def from_osm(cls, path, speeds=DEFAULT_SPEEDS):
+        """
+        Build a graph from an OSM XML extract, keeping only drivable highways.
+
+        Args:
+            path (str): .osm file, e.g. exported from openstreetmap.org or converted with osmium.
+            speeds (dict): km/h per highway class; classes not listed are skipped.
+        """
+        coords = {}
+        ways = []
+        for _, element in ET.iterparse(path, events=("end",)):
+            if element.tag == "node":
+                coords[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                speed = _way_speed(tags, speeds)
+                if speed:
+                    refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                    ways.append((refs, speed, _oneway(tags)))
+            if element.tag in ("node", "way", "relation"):
+                element.clear()
+
+        nodes = {}
+        edges = []
+        for refs, speed, oneway in ways:
+            refs = [ref for ref in refs if ref in coords]
+            for a, b in zip(refs, refs[1:]):
+                nodes[a] = coords[a]
+                nodes[b] = coords[b]
+                seconds = haversine_km(*coords[a], *coords[b]) / speed * 3600
+                if oneway >= 0:
+                    edges.append((a, b, seconds))
+                if oneway <= 0:
+                    edges.append((b, a, seconds))
+        return cls.from_edges(nodes, edges)
+
+    def save(self, path):
+        np.savez(path, node_ids=self.node_ids, lat=self.lat, lon=self.lon, indptr=self.indptr,
+                 targets=self.targets, seconds=self.seconds, cell_keys=self.cell_keys,
+                 cell_nodes=self.cell_nodes, cell_size=SNAP_CELL_SIZE)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = (None, None)
+            # Graphs saved without an index, or with another cell size, get a fresh one
+            if "cell_keys" in data and float(data["cell_size"]) == SNAP_CELL_SIZE:
+                index = (data["cell_keys"], data["cell_nodes"])
+            return cls(data["node_ids"], data["lat"], data["lon"], data["indptr"], data["targets"],
+                       data["seconds"], *index)
+
+    def nearest_node(self, lat, lon):
+        """
+        Return (node, distance_km) for the road node closest to a coordinate, or None if
+        the graph has no nodes.
+
+        Searches rings of grid cells outwards from the point and stops once no unvisited
+        ring can hold a closer node. Points far from every road fall back to a scan of
+        all nodes, which is cheaper than walking many empty rings.
+        """
+        if not len(self.lat):
+            return None
+        row, col = math.floor(lat / SNAP_CELL_SIZE), math.floor(lon / SNAP_CELL_SIZE)
+        best_node, best_km = None, math.inf
+        ring = 0
+        while (2 * ring + 1) ** 2 <= self._cell_count:
+            nodes = self._ring_nodes(row, col, ring)
+            if len(nodes):
+                distances = _haversine_km(lat, lon, self.lat[nodes], self.lon[nodes])
+                i = int(np.argmin(distances))
+                if distances[i] < best_km:
+                    best_node, best_km = int(nodes[i]), float(distances[i])
+            ring += 1
+            edge_lat = min(abs(lat) + ring * SNAP_CELL_SIZE, 90.0)
+            if best_km <= (ring - 1) * SNAP_CELL_SIZE * KM_PER_DEGREE * math.cos(math.radians(edge_lat)):
+                return best_node, best_km
+        distances = _haversine_km(lat, lon, self.lat, self.lon)
+        node = int(np.argmin(distances))
+        return node, float(distances[node])
+
+    def route(self, source, target):
+        """
+        Fastest path between two nodes using A* with a straight-line time bound.
+
+        Returns:
+            tuple: (seconds, [node, ...]), or (inf, []) if the target is unreachable.
+        """
+        indptr, targets, seconds, lats, lons = self._lists()
+        lat, lon = lats[target], lons[target]
+
+        def estimate(node):
+            return haversine_km(lats[node], lons[node], lat, lon) / self.max_speed
+
+        best = {source: 0.0}
+        previous = {}
+        heap = [(estimate(source), 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                return cost, self._path(previous, source, target)
+            if cost > best[node]:
+                continue
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = targets[edge]
+                new_cost = cost + seconds[edge]
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (new_cost + estimate(neighbour), new_cost, neighbour))
+        return math.inf, []
+
+    def travel_times(self, source, destinations, cutoff=math.inf):
+        """
+        Travel times from one node to many with a single Dijkstra search.
+
+        The search stops once every destination is settled or the cutoff is passed,
+        so ranking a handful of nearby hospitals explores only the local network.
+
+        Returns:
+            dict: Destination node -> seconds (inf if unreachable within the cutoff).
+        """
+        indptr, targets, seconds, _, _ = self._lists()
+        remaining = set(destinations)
+        times = dict.fromkeys(remaining, math.inf)
+        best = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            cost, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue
+            if cost > cutoff:
+                break
+            if node in remaining:
+                times[node] = cost
+                remaining.discard(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = targets[edge]
+                new_cost = cost + seconds[edge]
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+        return times
+
+    def rank_by_travel_time(self, lat, lon, candidates):
+        """
+        Order candidate destinations by estimated door-to-door travel time.
+
+        The gaps between each point and its nearest road node are covered at OFFROAD_SPEED.
+
+        Args:
+            lat, lon (float): Starting point.
+            candidates (list): Tuples whose first three items are (name, lat, lon).
+
+        Returns:
+            list: (seconds, candidate) tuples, fastest first; unreachable candidates last with inf.
+        """
+        if not candidates:
+            return []
+        if not len(self.lat):
+            return [(math.inf, candidate) for candidate in candidates]
+        source, source_gap = self.nearest_node(lat, lon)
+        snapped = [self.nearest_node(candidate[1], candidate[2]) for candidate in candidates]
+        times = self.travel_times(source, {node for node, _ in snapped})
+        ranked = []
+        for candidate, (node, gap) in zip(candidates, snapped):
+            offroad = (source_gap + gap) / OFFROAD_SPEED * 3600
+            ranked.append((times[node] + offroad, candidate))
+        ranked.sort(key=lambda item: item[0])
+        return ranked
+
+    def route_coordinates(self, start, end):
+        """Road path between two (lat, lon) points as a list of coordinates, or None if unreachable."""
+        if not len(self.lat):
+            return None
+        source, _ = self.nearest_node(*start)
+        target, _ = self.nearest_node(*end)
+        cost, path = self.route(source, target)
+        if not path:
+            return None
+        return [tuple(start)] + [(float(self.lat[n]), float(self.lon[n])) for n in path] + [tuple(end)]
+
+    def _ring_nodes(self, row, col, ring):
+        if ring == 0:
+            rows, cols = np.array([row]), np.array([col])
+        else:
+            span = np.arange(-ring, ring + 1)
+            inner = span[1:-1]
+            rows = np.concatenate([np.full(len(span), row - ring), np.full(len(span), row + ring),
+                                   row + inner, row + inner])
+            cols = np.concatenate([col + span, col + span, np.full(len(inner), col - ring),
+                                   np.full(len(inner), col + ring)])
+        keys = rows.astype(np.int64) * _CELL_STRIDE + cols
+        starts = np.searchsorted(self.cell_keys, keys, side="left")
+        ends = np.searchsorted(self.cell_keys, keys, side="right")
+        occupied = ends > starts
+        if not occupied.any():
+            return self.cell_nodes[:0]
+        return np.concatenate([self.cell_nodes[a:b] for a, b in zip(starts[occupied], ends[occupied])])
+
+    def _lists(self):
+        # Plain lists index several times faster than numpy arrays in the search loops
+        if self._adjacency is None:
+            self._adjacency = (self.indptr.tolist(), self.targets.tolist(), self.seconds.tolist(),
+                               self.lat.tolist(), self.lon.tolist())
+        return self._adjacency
+
+    def _max_speed(self):
+        if not len(self.targets):
+            return 1.0
+        sources = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        km = _haversine_km(self.lat[sources], self.lon[sources], self.lat[self.targets], self.lon[self.targets])
+        return float(np.max(km / np.maximum(self.seconds, 1e-6))) or 1.0
+
+    @staticmethod
+    def _path(previous, source, target):
+        path = [target]
+        while path[-1] != source:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+
+def _cell_index(lat, lon):
+    """Sorted grid cell keys of the nodes and the node order that matches them."""
+    rows = np.floor(np.asarray(lat) / SNAP_CELL_SIZE).astype(np.int64)
+    cols = np.floor(np.asarray(lon) / SNAP_CELL_SIZE).astype(np.int64)
+    keys = rows * _CELL_STRIDE + cols
+    order = np.argsort(keys, kind="stable").astype(np.int32)
+    return keys[order], order
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def _way_speed(tags, speeds):
+    highway = tags.get("highway")
+    if highway not in speeds or tags.get("access") in ("no", "private"):
+        return None
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", tags.get("maxspeed", ""))
+    if match:
+        speed = float(match.group(1)) * (1.609 if match.group(2) else 1)
+        if speed > 0:
+            return speed
+    return speeds[highway]
+
+
+def _oneway(tags):
+    """1 for forward only, -1 for reverse only, 0 for both directions."""
+    oneway = tags.get("oneway")
+    if oneway in ("yes", "true", "1") or (oneway is None and tags.get("junction") == "roundabout"):
+        return 1
+    if oneway == "-1":
+        return -1
+    return 0
+
+
+@lru_cache(maxsize=1)
+def default_road_graph(path=settings.ROAD_GRAPH):
+    """The graph configured by SAR_ROAD_GRAPH, loaded once per process; None if not configured."""
+    return RoadGraph.load(path) if path else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an OSM XML extract into a routing graph.")
+    parser.add_argument("osm", help="Input .osm file")
+    parser.add_argument("output", help="Output .npz file")
+    args = parser.parse_args()
+
+    graph = RoadGraph.from_osm(args.osm)
+    graph.save(args.output)
+    print(f"Saved {len(graph)} nodes and {len(graph.targets)} edges to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+
+
+class SessionManager:
+    def __init__(self, max_sessions=500, idle_timeout=3600, factory=KnowledgeBase, on_evict=None, store=None):
+        """
+        Keeps one KnowledgeBase state object per SAR session.
+
+        Heavy resources (embedder, vector store) live at module level in
+        knowledge_base_firstaid and are shared, so each session only costs its
+        own chat history and patient data.
+
+        Args:
+            max_sessions (int): Upper bound on sessions held in memory. The least
+                recently used session is evicted when it is exceeded.
+            idle_timeout (float): Seconds of inactivity after which a session is
+                evicted by evict_idle().
+            factory (callable): Builds a new state object from a session id.
+            on_evict (callable): Optional hook called with each evicted state.
+            store (SessionStore): Optional durable store. Sessions missing from
+                memory are resumed from it, and evicted sessions are snapshotted to it.
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.factory = factory
+        self.on_evict = on_evict
+        self.store = store
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Returns the state for a session, creating it if needed.
+
+        Args:
+            session_id (str): Identifier of the rescue session.
+
+        Returns:
+            KnowledgeBase: The session's state object.
+        """
+        evicted = []
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                if self.store is not None:
+                    state = self.store.load(session_id)
+                if state is None:
+                    state = self.factory(session_id)
+                self._sessions[session_id] = state
+                while len(self._sessions) > self.max_sessions:
+                    evicted.append(self._sessions.popitem(last=False)[1])
+            else:
+                self._sessions.move_to_end(session_id)
+            state.touch()
+        self._notify(evicted)
+        return state
+
+    def peek(self, session_id):
+        """Returns the state for a session without creating or touching it."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id):
+        """
+        Drops a session from memory.
+
+        Returns:
+            KnowledgeBase: The removed state, or None if it was not held.
+        """
+        with self._lock:
+            state = self._sessions.pop(session_id, None)
+        self._notify([state] if state is not None else [])
+        return state
+
+    def evict_idle(self, now=None):
+        """
+        Evicts every session idle for longer than idle_timeout.
+
+        Returns:
+            list: Ids of the evicted sessions.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = []
+        with self._lock:
+            # Sessions are ordered by last access, so stop at the first live one
+            while self._sessions:
+                session_id, state = next(iter(self._sessions.items()))
+                if now - state.last_active < self.idle_timeout:
+                    break
+                evicted.append(self._sessions.pop(session_id))
+        self._notify(evicted)
+        return [state.session_id for state in evicted]
+
+    def session_ids(self):
+        """Returns the ids of the sessions currently held in memory."""
+        with self._lock:
+            return list(self._sessions)
+
+    def record(self, state, kind, payload):
+        """Appends a turn for the session to the durable store, if one is configured."""
+        if self.store is not None:
+            self.store.append_turn(state, kind, payload)
+
+    def _notify(self, evicted):
+        for state in evicted:
+            if self.store is not None:
+                self.store.save_snapshot(state)
+            if self.on_evict is not None:
+                self.on_evict(state)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
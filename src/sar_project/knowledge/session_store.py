@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    snapshot BLOB NOT NULL,
+    snapshot_seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def apply_turn(state, kind, payload):
+    """
+    Applies one logged turn to a session state without calling Gemini.
+
+    Args:
+        state (KnowledgeBase): Session state to update in place.
+        kind (str): "message" for a chat turn or "location" for a location update.
+        payload (dict): The values recorded for the turn.
+    """
+    if kind == "message":
+        state.chat_history.append(payload["message"])
+        state.data = payload["data"]
+        if "summary" in payload:
+            state.chat_history = [payload["summary"]]
+    elif kind == "location":
+        state.lat = payload["lat"]
+        state.lon = payload["lon"]
+        state.weather = payload["weather"]
+        state.nearest_hospital = payload["nearest_hospital"]
+        location = payload.get("hospital_location")
+        state.hospital_location = tuple(location) if location else None
+    else:
+        raise ValueError(f"Unknown turn kind: {kind}")
+
+
+class SessionStore:
+    def __init__(self, path, snapshot_every=20):
+        """
+        Durable SQLite store for session state.
+
+        Every turn is appended to an indexed log, and a compressed snapshot of
+        the full state is written every `snapshot_every` turns. Loading a
+        session reads the latest snapshot and replays only the turns after it.
+
+        Args:
+            path (str): SQLite database file.
+            snapshot_every (int): Number of turns between snapshots.
+        """
+        self.snapshot_every = snapshot_every
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._last_seq = {}
+        self._snapshot_seq = {}
+
+    def append_turn(self, state, kind, payload):
+        """
+        Appends a turn to the session's log, snapshotting when one is due.
+
+        Args:
+            state (KnowledgeBase): Session state after the turn was applied.
+            kind (str): Turn kind understood by apply_turn().
+            payload (dict): The values recorded for the turn.
+
+        Returns:
+            int: Sequence number of the new turn.
+        """
+        session_id = state.session_id
+        with self._lock:
+            seq = self._next_seq(session_id)
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT INTO turns (session_id, seq, created_at, kind, payload) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, time.time(), kind, json.dumps(payload, separators=(",", ":"))),
+                )
+                if seq - self._snapshot_seq.get(session_id, 0) >= self.snapshot_every:
+                    self._write_snapshot(state, seq)
+            self._last_seq[session_id] = seq
+        return seq
+
+    def save_snapshot(self, state):
+        """Writes a snapshot of the session at its latest turn, e.g. before it is evicted."""
+        with self._lock:
+            seq = self._next_seq(state.session_id) - 1
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._write_snapshot(state, seq)
+
+    def load(self, session_id):
+        """
+        Restores a session from its latest snapshot and the turns logged after it.
+
+        Args:
+            session_id (str): Identifier of the rescue session.
+
+        Returns:
+            KnowledgeBase: The restored state, or None if the session is unknown.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot, snapshot_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            snapshot_seq = row[1] if row else 0
+            turns = self._conn.execute(
+                "SELECT seq, kind, payload FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, snapshot_seq),
+            ).fetchall()
+
+        if row is None and not turns:
+            return None
+        state = KnowledgeBase.from_dict(json.loads(zlib.decompress(row[0]))) if row else KnowledgeBase(session_id)
+        for _, kind, payload in turns:
+            apply_turn(state, kind, json.loads(payload))
+
+        with self._lock:
+            self._snapshot_seq[session_id] = snapshot_seq
+            self._last_seq[session_id] = turns[-1][0] if turns else snapshot_seq
+        return state
+
+    def delete(self, session_id):
+        """Removes a session's snapshot and turn log."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._last_seq.pop(session_id, None)
+            self._snapshot_seq.pop(session_id, None)
+
+    def close(self):
+        self._conn.close()
+
+    def _next_seq(self, session_id):
+        if session_id not in self._last_seq:
+            row = self._conn.execute(
+                "SELECT MAX(seq) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self._last_seq[session_id] = row[0] or 0
+        return self._last_seq[session_id] + 1
+
+    def _write_snapshot(self, state, seq):
+        snapshot = zlib.compress(json.dumps(state.to_dict(), separators=(",", ":")).encode("utf-8"))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, snapshot, snapshot_seq, updated_at) VALUES (?, ?, ?, ?)",
+            (state.session_id, snapshot, seq, time.time()),
+        )
+        self._snapshot_seq[state.session_id] = seq
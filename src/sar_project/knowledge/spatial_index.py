@@ -0,0 +1,220 @@
+import heapq
+import itertools
+from math import radians, cos, sin, sqrt, atan2, floor
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def parse_coordinates(location):
+    """
+    Reads coordinates from a location identifier.
+
+    Args:
+        location: A (lat, lon) pair or a "lat,lon" string. Other names are not spatial.
+
+    Returns:
+        tuple: (lat, lon) as floats, or None if the location has no coordinates.
+    """
+    if isinstance(location, (tuple, list)) and len(location) == 2:
+        parts = location
+    elif isinstance(location, str) and location.count(",") == 1:
+        parts = location.split(",")
+    else:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except (TypeError, ValueError):
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def _segment_distance_km(lat, lon, lat1, lon1, lat2, lon2):
+    """Distance from a point to a segment, using a local equirectangular projection."""
+    scale = cos(radians((lat1 + lat2) / 2)) * KM_PER_DEGREE
+    px, py = (lon - lon1) * scale, (lat - lat1) * KM_PER_DEGREE
+    dx, dy = (lon2 - lon1) * scale, (lat2 - lat1) * KM_PER_DEGREE
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, (px * dx + py * dy) / length))
+    return sqrt((px - t * dx) ** 2 + (py - t * dy) ** 2)
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=0.05):
+        """
+        Uniform lat/lon grid index over keyed points.
+
+        Args:
+            cell_size (float): Grid cell size in degrees (0.05 is roughly 5 km).
+        """
+        self.cell_size = cell_size
+        self._points = {}
+        self._cells = {}
+        # Tie-breaker so heap entries never compare keys of different types
+        self._order = itertools.count()
+        # Range of occupied cell rows and columns; only widened, so it stays a safe bound
+        self._bounds = None
+
+    def _cell(self, lat, lon):
+        return floor(lat / self.cell_size), floor(lon / self.cell_size)
+
+    def insert(self, key, lat, lon):
+        """Adds a point, replacing any previous position stored under the same key."""
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._points[key] = (lat, lon, cell)
+        self._cells.setdefault(cell, set()).add(key)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            self._bounds = [min(self._bounds[0], cell[0]), max(self._bounds[1], cell[0]),
+                            min(self._bounds[2], cell[1]), max(self._bounds[3], cell[1])]
+
+    def remove(self, key):
+        """Removes a point if present."""
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        keys = self._cells[point[2]]
+        keys.discard(key)
+        if not keys:
+            del self._cells[point[2]]
+
+    def position(self, key):
+        """Returns the (lat, lon) stored for a key, or None."""
+        point = self._points.get(key)
+        return point[:2] if point else None
+
+    def nearest(self, lat, lon, k=1, max_distance_km=None):
+        """
+        Finds the points closest to a location.
+
+        Searches rings of grid cells outwards from the query cell and stops once
+        no unvisited ring can contain anything closer than the current k-th match.
+
+        Args:
+            lat (float): Query latitude.
+            lon (float): Query longitude.
+            k (int): Number of points to return.
+            max_distance_km (float): Ignore points further away than this.
+
+        Returns:
+            list: (distance_km, key) tuples, closest first.
+        """
+        if not self._points:
+            return []
+        ci, cj = self._cell(lat, lon)
+        min_i, max_i, min_j, max_j = self._bounds
+        max_ring = max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j))
+
+        best = []
+        for ring in range(max_ring + 1):
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                # The ring now spans more cells than are occupied; scanning them all is cheaper
+                return self._scan_nearest(lat, lon, k, max_distance_km, best, ring)
+            for cell in self._ring_cells(ci, cj, ring):
+                for key in self._cells.get(cell, ()):
+                    self._offer(best, k, lat, lon, key, max_distance_km)
+            next_ring_km = self._ring_min_km(lat, ring + 1)
+            if len(best) == k and -best[0][0] <= next_ring_km:
+                break
+            if max_distance_km is not None and next_ring_km > max_distance_km:
+                break
+        return self._ranked(best)
+
+    def within_bbox(self, south, west, north, east):
+        """Returns the keys of points inside a bounding box."""
+        (i0, j0), (i1, j1) = self._cell(south, west), self._cell(north, east)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= len(self._cells):
+            cells = ((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+        else:
+            cells = (cell for cell in self._cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1)
+        keys = []
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                lat, lon, _ = self._points[key]
+                if south <= lat <= north and west <= lon <= east:
+                    keys.append(key)
+        return keys
+
+    def along_corridor(self, path, width_km):
+        """
+        Returns the keys of points within `width_km` of a path.
+
+        Args:
+            path (list): (lat, lon) vertices of the route or search sector line.
+            width_km (float): Half-width of the corridor in kilometres.
+
+        Returns:
+            list: (distance_km, key) tuples ordered by distance from the path.
+        """
+        if len(path) == 1:
+            path = [path[0], path[0]]
+        found = {}
+        for (lat1, lon1), (lat2, lon2) in zip(path, path[1:]):
+            pad_lat = width_km / KM_PER_DEGREE
+            pad_lon = width_km / (KM_PER_DEGREE * max(cos(radians(max(abs(lat1), abs(lat2)) + pad_lat)), 1e-6))
+            candidates = self.within_bbox(min(lat1, lat2) - pad_lat, min(lon1, lon2) - pad_lon,
+                                          max(lat1, lat2) + pad_lat, max(lon1, lon2) + pad_lon)
+            for key in candidates:
+                lat, lon, _ = self._points[key]
+                distance = _segment_distance_km(lat, lon, lat1, lon1, lat2, lon2)
+                if distance <= width_km and distance < found.get(key, float("inf")):
+                    found[key] = distance
+        return sorted(((distance, key) for key, distance in found.items()), key=lambda match: match[0])
+
+    def _ring_cells(self, ci, cj, ring):
+        if ring == 0:
+            yield ci, cj
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield ci - ring, j
+            yield ci + ring, j
+        for i in range(ci - ring + 1, ci + ring):
+            yield i, cj - ring
+            yield i, cj + ring
+
+    def _ring_min_km(self, lat, ring):
+        """Lower bound on the distance to any point in the given ring of cells."""
+        edge_lat = min(abs(lat) + ring * self.cell_size, 90.0)
+        return (ring - 1) * self.cell_size * KM_PER_DEGREE * cos(radians(edge_lat))
+
+    def _offer(self, best, k, lat, lon, key, max_distance_km):
+        p_lat, p_lon, _ = self._points[key]
+        distance = haversine_km(lat, lon, p_lat, p_lon)
+        if max_distance_km is not None and distance > max_distance_km:
+            return
+        # Max-heap on distance via negation, holding the k best so far
+        if len(best) < k:
+            heapq.heappush(best, (-distance, next(self._order), key))
+        elif distance < -best[0][0]:
+            heapq.heapreplace(best, (-distance, next(self._order), key))
+
+    def _scan_nearest(self, lat, lon, k, max_distance_km, best, ring):
+        ci, cj = self._cell(lat, lon)
+        for cell, keys in self._cells.items():
+            if max(abs(cell[0] - ci), abs(cell[1] - cj)) < ring:
+                continue
+            for key in keys:
+                self._offer(best, k, lat, lon, key, max_distance_km)
+        return self._ranked(best)
+
+    @staticmethod
+    def _ranked(best):
+        return [(-neg, key) for neg, _, key in sorted(best, key=lambda entry: entry[:2], reverse=True)]
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def __len__(self):
+        return len(self._points)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import torch
+from sar_project.knowledge.cpu_embedder import CPUEmbedder, compare_embedders
+
+
+# Small torch model with a SentenceTransformer-style encode: a Linear layer over character counts.
+class TinyEncoder(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.linear = torch.nn.Linear(26, 16)
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.batches.append([len(text) for text in texts])
+        counts = torch.zeros(len(texts), 26)
+        for i, text in enumerate(texts):
+            for char in text.lower():
+                if char.isalpha():
+                    counts[i, ord(char) - ord("a")] += 1
+        with torch.no_grad():
+            return self.linear(counts).numpy()
+
+
+@pytest.fixture(autouse=True)
+def restore_torch_threads():
+    # CPUEmbedder(threads=...) sets the process-wide torch thread count
+    threads = torch.get_num_threads()
+    yield
+    torch.set_num_threads(threads)
+
+
+TEXTS = ["cpr", "tourniquet above the wound", "a", "recovery position for unconscious patients", "burns"]
+
+
+def test_length_sorted_batches_keep_input_order():
+    model = TinyEncoder()
+    embedder = CPUEmbedder(model=model, quantize=False, batch_size=2)
+    vectors = embedder.encode(TEXTS)
+
+    expected = model.encode(TEXTS)
+    assert np.allclose(vectors, expected, atol=1e-5)
+    assert model.batches[0] == [1, 3]
+    assert embedder.encode("cpr").shape == (16,)
+
+
+def test_quantized_model_stays_close_to_baseline():
+    baseline = TinyEncoder()
+    embedder = CPUEmbedder(model=TinyEncoder(), quantize=True, threads=1, batch_size=4)
+
+    assert embedder.quantized
+    assert embedder.threads == 1
+    results = compare_embedders(baseline, embedder, TEXTS, repeats=1)
+    assert results["mean_cosine"] > 0.99
+    assert compare_embedders(baseline, baseline, TEXTS, repeats=1)["neighbour_agreement"] == 1.0
+
+
+def test_batch_size_is_tuned_when_loaded():
+    model = TinyEncoder()
+    embedder = CPUEmbedder(model=model, quantize=False)
+    assert embedder.batch_size in (8, 16, 32, 64, 128)
+
+    # The first query runs straight away with the tuned size
+    model.batches.clear()
+    embedder.encode(TEXTS)
+    assert len(model.batches) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from sar_project.knowledge.embedding_service import EmbeddingServer, RemoteEmbedder, load_embedder
+
+
+# Stands in for SentenceTransformer: each text becomes [len(text), call number].
+class DummyModel:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls += 1
+        return np.array([[len(text), self.calls] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = EmbeddingServer(str(tmp_path / "embed.sock"), model=DummyModel(), max_batch=64, max_wait_ms=50)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    task = loop.create_task(server.serve(ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait(5)
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(5)
+
+
+def test_concurrent_requests_are_batched(server):
+    embedder = RemoteEmbedder(server.socket_path)
+    texts = [f"query {'x' * i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(embedder.encode, texts))
+
+    assert [int(vector[0]) for vector in results] == [len(text) for text in texts]
+    assert server.requests == 16
+    assert server.batches < 16
+
+
+def test_batch_encode_matches_sentence_transformer_shape(server):
+    embedder = load_embedder(server.socket_path)
+    vectors = embedder.encode(["cpr", "tourniquet"])
+
+    assert isinstance(embedder, RemoteEmbedder)
+    assert vectors.shape == (2, 2)
+    assert vectors.dtype == np.float32
+    assert vectors.tolist()[1][0] == len("tourniquet")
@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+import pytest
+from sar_project.knowledge import EventLog, KnowledgeBase
+
+
+@pytest.fixture
+def log(tmp_path):
+    return EventLog(hot_capacity=8, spill_batch=4, spill_path=str(tmp_path / "events.db"))
+
+
+def fill(log, count, start=1000.0):
+    for i in range(count):
+        log.append({"timestamp": start + i, "event_type": "position" if i % 2 else "status",
+                    "team": f"team-{i % 3}", "index": i})
+
+
+def test_range_and_filters_span_hot_and_cold_tiers(log):
+    fill(log, 20)
+
+    assert len(log) == 20
+    assert log._count <= 8
+    assert [e.details["index"] for e in log.query(start=1002, end=1010)] == list(range(2, 10))
+    assert [e.details["index"] for e in log.query(event_type="position", team="team-1")] == [1, 7, 13, 19]
+    assert [e.details["index"] for e in log.recent(5, team="team-0", now=1020)] == [15, 18]
+
+
+def test_late_events_are_found(log):
+    fill(log, 5)
+    log.append({"timestamp": 1001.5, "event_type": "status", "index": "late"})
+
+    assert [e.details["index"] for e in log.query(start=1001, end=1002)] == [1, "late"]
+
+
+def test_knowledge_base_mission_history():
+    kb = KnowledgeBase(event_log=EventLog(hot_capacity=4, spill_batch=2))
+    events = [{"timestamp": 10.0 + i, "action": "search", "team": "alpha", "outcome": i} for i in range(6)]
+    for event in events:
+        kb.log_mission_event(event)
+
+    assert kb.get_mission_history() == events
+    assert kb.query_mission_events(start=13, event_type="search", team="alpha") == events[3:]
+    kb.mission_history.close()
+
+
+def test_hot_and_cold_events_have_the_same_types(log):
+    log.append({"timestamp": datetime(2024, 5, 1, 12, 0), "type": "drop", "point": (46.1, -121.2)})
+    hot = log.query()[0].details
+    fill(log, 10, start=datetime(2024, 5, 1, 12, 0).timestamp() + 1)
+    cold = log.query()[0].details
+
+    assert log._cold_count > 0
+    assert hot == cold == {"timestamp": "2024-05-01T12:00:00", "type": "drop", "point": [46.1, -121.2]}
+    with pytest.raises(TypeError):
+        log.append({"timestamp": 1.0, "payload": object()})
+
+
+def test_close_removes_temporary_spill_file():
+    with EventLog(hot_capacity=2, spill_batch=1) as log:
+        fill(log, 4)
+        path = log.spill_path
+        assert os.path.exists(path)
+    assert not os.path.exists(path)
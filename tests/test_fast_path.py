@@ -0,0 +1,108 @@
+import hashlib
+import numpy as np
+import pytest
+from sar_project.agents.fast_path import FastPath
+from sar_project.agents.first_aid_agent import FirstAidAgent
+from sar_project.agents.mission_bundle import build_bundle
+from sar_project.agents.weather_risk import ConditionsGrid
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+
+
+# Bag-of-words embedder: deterministic, and similar wording gives similar vectors.
+class WordEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().replace("?", "").split():
+                vectors[i, int(hashlib.md5(word.encode()).hexdigest(), 16) % 256] += 1
+        return vectors
+
+
+@pytest.fixture
+def fast_path():
+    return FastPath(WordEmbedder(), threshold=0.75)
+
+
+def test_classifies_protocol_questions(fast_path):
+    intent, score = fast_path.classify("how do I apply a tourniquet")
+    assert intent.name == "tourniquet"
+    assert score > 0.9
+
+    intent, _ = fast_path.classify("The climber fell and is not moving")
+    assert intent is None
+    long_message = "How do I apply a tourniquet " + "while the patient is " * 10
+    assert fast_path.classify(long_message) == (None, 0.0)
+
+
+def test_answer_uses_template_and_passage(fast_path):
+    retrieved = []
+
+    def retrieve(query):
+        retrieved.append(query)
+        return "Compress at 100-120 per minute."
+
+    first = fast_path.answer("What is the compression rate for CPR?", retrieve)
+    second = fast_path.answer("what is the compression rate for cpr", retrieve)
+
+    assert "100-120 compressions per minute" in first
+    assert "Compress at 100-120 per minute." in first
+    assert first == second
+    # Both hits look up the intent's own query, never the user's wording
+    assert len(set(retrieved)) == 1
+
+
+def test_agent_falls_through_to_gemini(fast_path, monkeypatch):
+    kb = KnowledgeBase("fast")
+    kb.weather, kb.nearest_hospital = "Clear", "Test Hospital, Location: 1.0, 2.0 (Distance: 1.00 km)"
+    agent = FirstAidAgent(knowledge_base=kb, fast_path=fast_path)
+    monkeypatch.setattr(agent, "retrieve_relevant_text", lambda message: "Reference text.")
+    prompts = []
+    monkeypatch.setattr(agent, "query_gemini", lambda prompt: prompts.append(prompt) or "Gemini answer")
+
+    assert agent.process_request("How do I treat a burn?").startswith("Burns:")
+    assert prompts == []
+    assert agent.process_request("Patient fell 10 m and is drowsy, what now?") == "Gemini answer"
+    assert len(prompts) == 1
+
+
+def build_test_bundle(path):
+    def conditions(points, hours):
+        values = np.zeros((len(points), hours + 1))
+        return ConditionsGrid(points, wind_speed=values, visibility=values, temperature=values,
+                              precipitation=values)
+
+    build_bundle(path, 46.0, -122.0, 47.0, -121.0, rows=2, cols=2, hours=1, queries=[],
+                 retrieve=lambda query: f"Bundled: {query}", fetch=conditions,
+                 fetch_hospitals=lambda *bbox: [], inline_assets=False)
+
+
+def test_passages_come_from_the_bundle(fast_path, tmp_path):
+    build_test_bundle(str(tmp_path))
+
+    class OfflineKnowledgeBase:
+        def retrieve_relevant_text(self, message):
+            raise AssertionError("vector store queried")
+
+    agent = FirstAidAgent(knowledge_base=OfflineKnowledgeBase(), fast_path=fast_path)
+    agent.load_bundle(str(tmp_path))
+    answer = agent.fast_answer("how do I apply a tourniquet")
+    assert "Bundled: " in answer
+
+
+def test_bundle_loaded_after_a_hit_is_used(fast_path, tmp_path):
+    class VectorStoreKnowledgeBase:
+        def retrieve_relevant_text(self, message):
+            return "From the vector store."
+
+    # One fast path shared by every agent in the process, like default_fast_path()
+    agent = FirstAidAgent(knowledge_base=VectorStoreKnowledgeBase(), fast_path=fast_path)
+    agent.bundle = None
+    assert "From the vector store." in agent.fast_answer("how do I apply a tourniquet")
+
+    build_test_bundle(str(tmp_path))
+    agent.load_bundle(str(tmp_path))
+    assert "Bundled: " in agent.fast_answer("how do I apply a tourniquet")
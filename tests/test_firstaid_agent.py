@@ -3,6 +3,7 @@ import os
 import webbrowser
 import pytest
 import requests
+from sar_project import instrumentation
 from sar_project.agents.first_aid_agent import FirstAidAgent
 
 
@@ -15,6 +16,7 @@ class DummyKnowledgeBase:
         self.data = {"patient_status": "stable"}
         self.weather = "Temperature: 25°C, Wind Speed: 10 km/h, Condition: 800"
         self.nearest_hospital = "Test Hospital, Location: 12.35, 56.79 (Distance: 1.00 km)"
+        self.hospital_location = (12.35, 56.79)
 
     def retrieve_relevant_text(self, message):
         return "Relevant first aid text snippet."
@@ -124,6 +126,17 @@ def test_get_nearest_hospital(monkeypatch, agent, dummy_base):
     assert "Distance:" in hospital_info
 
 
+def test_get_nearest_hospital_counts_http_errors(monkeypatch, agent):
+    instrumentation.registry.reset()
+
+    class FakeResponse:
+        status_code = 429
+
+    monkeypatch.setattr(requests, "get", lambda url, params: FakeResponse())
+    assert agent.get_nearest_hospital() == "Error: Received status code 429"
+    assert 'sar_external_calls_total{outcome="error",service="overpass"} 1' in instrumentation.export_prometheus()
+
+
 def test_extract_lat_lon(agent, dummy_base):
     # Use the dummy nearest_hospital string to test coordinate extraction.
     dummy_base.nearest_hospital = "Test Hospital, Location: 12.35, 56.79 (Distance: 1.00 km)"
@@ -147,6 +160,7 @@ def test_generate_map(monkeypatch, agent, dummy_base, tmp_path):
     dummy_base.lat = 12.34
     dummy_base.lon = 56.78
     dummy_base.nearest_hospital = "Test Hospital, Location: 12.35, 56.79 (Distance: 1.00 km)"
+    dummy_base.hospital_location = (12.35, 56.79)
 
     filename = agent.generate_map()
 
@@ -156,6 +170,21 @@ def test_generate_map(monkeypatch, agent, dummy_base, tmp_path):
     assert called
 
 
+def test_build_map_reuses_the_session_renderer(monkeypatch, agent, dummy_base):
+    renderer = agent.build_map()
+    hospitals = renderer.render_layer("hospitals")
+    version = renderer.version
+
+    assert agent.build_map() is renderer
+    assert renderer.version == version
+
+    dummy_base.lat, dummy_base.lon = 12.30, 56.70
+    assert agent.bind(dummy_base).build_map() is renderer
+    assert renderer.changed_since(version) == ["routes", "rescuers"]
+    assert renderer.render_layer("hospitals") is hospitals
+    assert agent.bind(DummyKnowledgeBase()).build_map() is not renderer
+
+
 def test_summarize_chat_history(monkeypatch, agent, dummy_base):
     # Test that summarize_chat_history modifies the chat history when too long.
     # Start with a chat_history longer than 6.
@@ -0,0 +1,56 @@
+import json
+import pstats
+from sar_project import instrumentation
+from sar_project.knowledge.cache import TTLCache
+
+
+def setup_function():
+    instrumentation.registry.reset()
+
+
+def test_spans_external_calls_and_cache_counters():
+    with instrumentation.span("embed"):
+        pass
+    try:
+        with instrumentation.external_call("overpass"):
+            raise ConnectionError("offline")
+    except ConnectionError:
+        pass
+    cache = TTLCache(name="forecast")
+    cache.get("missing")
+    cache.set("key", 1)
+    cache.get("key")
+
+    text = instrumentation.export_prometheus()
+    assert 'sar_stage_duration_seconds_count{stage="embed"} 1' in text
+    assert 'sar_stage_duration_seconds_bucket{stage="overpass",le="+Inf"} 1' in text
+    assert 'sar_external_calls_total{outcome="error",service="overpass"} 1' in text
+    assert 'sar_cache_requests_total{cache="forecast",result="hit"} 1' in text
+    assert 'sar_cache_requests_total{cache="forecast",result="miss"} 1' in text
+
+
+def test_jsonl_export_and_span_log(tmp_path):
+    span_log = tmp_path / "spans.jsonl"
+    instrumentation.set_span_log(str(span_log))
+    with instrumentation.span("gemini", session="team-a"):
+        pass
+    instrumentation.set_span_log(None)
+    instrumentation.write_jsonl(str(tmp_path / "metrics.jsonl"))
+
+    span = json.loads(span_log.read_text())
+    assert span["stage"] == "gemini" and span["session"] == "team-a"
+    snapshot = json.loads((tmp_path / "metrics.jsonl").read_text())
+    assert snapshot["histograms"][0]["count"] == 1
+
+
+def test_profiling_is_per_session(tmp_path):
+    profiler = instrumentation.SessionProfiler()
+    profiler.enable("team-a", str(tmp_path))
+    with profiler.profile("team-a", "request"):
+        sum(range(1000))
+    with profiler.profile("team-b", "request") as disabled:
+        assert disabled is None
+
+    profiles = list(tmp_path.glob("team-a-request-*.prof"))
+    assert len(profiles) == 1
+    pstats.Stats(str(profiles[0]))
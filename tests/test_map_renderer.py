@@ -0,0 +1,77 @@
+import random
+from sar_project.agents.map_renderer import MapRenderer
+from sar_project.agents.weather_risk import RiskTiles
+
+
+def test_renders_layers_into_shared_base():
+    renderer = MapRenderer()
+    renderer.add_marker("rescuers", "team-1", 46.85, -121.76, popup="Team 1")
+    renderer.add_marker("hospitals", "h1", 46.9, -121.7, tooltip="Hospital")
+    renderer.add_route("h1", [(46.85, -121.76), (46.9, -121.7)])
+
+    html = renderer.render()
+    assert html.count("<html") == 1
+    assert "leaflet.markercluster" in html
+    assert "Team 1" in html
+    assert "L.polyline.antPath" in html
+    assert "markerClusterGroup(" not in html.split("window.sarLayers = {};")[1]
+
+
+def test_plugins_load_after_leaflet():
+    html = MapRenderer().render()
+    leaflet = html.index("/leaflet.js")
+    assert leaflet < html.index("leaflet.markercluster.js")
+    assert leaflet < html.index("leaflet-ant-path")
+
+
+def test_only_changed_layers_are_rebuilt():
+    renderer = MapRenderer()
+    renderer.set_layer("patients", {i: (46 + i / 1000, -121, None, None) for i in range(100)})
+    renderer.add_marker("rescuers", "team-1", 46.85, -121.76)
+    first = renderer.render_layer("patients")
+    version = renderer.version
+
+    renderer.add_marker("rescuers", "team-1", 46.86, -121.75)
+
+    assert renderer.changed_since(version) == ["rescuers"]
+    assert renderer.render_layer("patients") is first
+    assert "markerClusterGroup" in first
+    assert "46.86" in renderer.render_layer("rescuers")
+
+
+def test_thousands_of_points_rebuild_only_what_changed(tmp_path, monkeypatch):
+    random.seed(1)
+    renderer = MapRenderer(output_dir=str(tmp_path))
+    for layer in ("rescuers", "patients", "hospitals"):
+        renderer.set_layer(layer, {i: (46 + random.random(), -122 + random.random(), f"{layer} {i}", None)
+                                   for i in range(2000)})
+    page = renderer.render()
+    assert page.count("markerClusterGroup(") == 3
+
+    built = []
+    build_fragment = renderer._build_fragment
+    monkeypatch.setattr(renderer, "_build_fragment",
+                        lambda layer, items: built.append(layer) or build_fragment(layer, items))
+
+    assert renderer.render() is page
+    renderer.add_marker("hospitals", 0, *renderer.layers["hospitals"][0])
+    assert renderer.render() is page
+    assert built == []
+
+    renderer.add_marker("rescuers", 0, 46.5, -121.5)
+    path = renderer.save(session_id="ops")
+    assert built == ["rescuers"]
+    assert path == str(tmp_path / "ops.html")
+    assert renderer.to_bytes().startswith(b"<!DOCTYPE html>")
+
+
+def test_risk_cells_from_tiles():
+    tiles = RiskTiles(46.0, -122.0, 47.0, -121.0, rows=2, cols=2)
+    tiles.tiles = [{"location": point, "risk_level": i % 3, "risks": ["high_wind"] if i else []}
+                   for i, point in enumerate(tiles.points)]
+    renderer = MapRenderer()
+    renderer.set_risk_cells(tiles)
+
+    assert len(renderer.layers["risk"]) == 4
+    assert renderer.layers["risk"][1][4] == 1
+    assert "L.rectangle" in renderer.render()
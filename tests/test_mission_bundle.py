@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import requests
+from sar_project.agents import weather_risk
+from sar_project.agents.first_aid_agent import FirstAidAgent
+from sar_project.agents.mission_bundle import MissionBundle, build_bundle
+from sar_project.agents.weather_risk import ConditionsGrid
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+from sar_project.knowledge.road_network import RoadGraph
+
+
+# Start of the first hourly column, as Open-Meteo reports it
+FORECAST_START = 1714564800.0
+
+
+def fake_conditions(points, hours):
+    # Wind grows by 1 km/h per column so the test can tell which column was served
+    wind = np.tile(np.arange(hours + 1, dtype=float), (len(points), 1))
+    return ConditionsGrid(points, wind_speed=wind, visibility=np.full_like(wind, 10.0),
+                          temperature=np.full_like(wind, 4.0), precipitation=np.zeros_like(wind),
+                          weather_code=np.full_like(wind, 61.0), start_time=FORECAST_START)
+
+
+@pytest.fixture
+def bundle_dir(tmp_path):
+    build_bundle(
+        str(tmp_path / "bundle"), 46.0, -122.0, 47.0, -121.0, rows=3, cols=3, hours=6,
+        queries=["How do I apply a tourniquet?"],
+        retrieve=lambda query: "Apply it 2-3 inches above the wound.",
+        fetch=fake_conditions,
+        fetch_hospitals=lambda *bbox: [("Ridge Clinic", 46.6, -121.4), ("Valley Hospital", 46.1, -121.9)],
+        inline_assets=False,
+    )
+    return str(tmp_path / "bundle")
+
+
+def test_bundle_loads_memory_mapped(bundle_dir):
+    bundle = MissionBundle(bundle_dir)
+
+    assert isinstance(bundle.arrays["forecast_wind_speed"], np.memmap)
+    assert bundle.hospitals(46.55, -121.45)[0][0] == "Ridge Clinic"
+    assert bundle.cached_passages("how do i apply a TOURNIQUET") == "Apply it 2-3 inches above the wound."
+    assert bundle.cached_passages("How do I treat a burn?") is None
+    assert bundle.manifest["forecast_start"] == FORECAST_START
+    # The current reading covers the first hour, then column k is the hour starting at (k - 1) h
+    assert (bundle.weather_at(46.0, -122.0, now=FORECAST_START + 1200)
+            == "Temperature: 4.0°C, Wind Speed: 0.0 km/h, Condition: 61")
+    assert "Wind Speed: 3.0 km/h" in bundle.weather_at(46.0, -122.0, now=FORECAST_START + 2.5 * 3600)
+    assert "Wind Speed: 6.0 km/h" in bundle.weather_at(46.0, -122.0, now=FORECAST_START + 5.5 * 3600)
+    assert bundle.weather_at(46.0, -122.0, now=FORECAST_START + 6 * 3600) is None
+    assert bundle.weather_at(46.0, -122.0, now=FORECAST_START - 60) is None
+    head, tail, map_name = bundle.map_template()
+    assert f"var {map_name} = L.map(" in head
+
+
+def test_agent_works_offline_with_bundle(bundle_dir, monkeypatch):
+    def offline(*args, **kwargs):
+        raise AssertionError("the bundle should answer without network, Overpass or vector store calls")
+
+    monkeypatch.setattr(requests, "get", offline)
+    monkeypatch.setattr(requests, "post", offline)
+    monkeypatch.setattr(weather_risk, "fetch_conditions", offline)
+    monkeypatch.setattr(KnowledgeBase, "retrieve_relevant_text", offline)
+    monkeypatch.setattr("time.time", lambda: FORECAST_START + 1800)
+    kb = KnowledgeBase("offline")
+    kb.lat, kb.lon = 46.5, -121.5
+    agent = FirstAidAgent(knowledge_base=kb)
+    agent.load_bundle(bundle_dir)
+
+    result = agent.update_location(46.5, -121.5)
+    assert result["nearest_hospital"].startswith("Ridge Clinic, Location: 46.6, -121.4")
+    assert result["weather"] == "Temperature: 4.0°C, Wind Speed: 0.0 km/h, Condition: 61"
+    assert agent.retrieve_relevant_text("How do I apply a tourniquet?") == "Apply it 2-3 inches above the wound."
+    assert agent.build_map().render().startswith(agent.bundle.map_template()[0])
+
+
+def test_bundle_ships_road_graph(tmp_path):
+    nodes = {1: (46.5, -121.5), 2: (46.6, -121.4)}
+    graph = RoadGraph.from_edges(nodes, [(1, 2, 600.0), (2, 1, 600.0)])
+    build_bundle(str(tmp_path), 46.0, -122.0, 47.0, -121.0, rows=2, cols=2, hours=1, queries=[],
+                 retrieve=lambda query: "", fetch=fake_conditions, fetch_hospitals=lambda *bbox: [],
+                 inline_assets=False, road_graph=graph)
+
+    agent = FirstAidAgent(knowledge_base=KnowledgeBase("bundle-graph"))
+    agent.road_graph = None
+    agent.load_bundle(str(tmp_path))
+    assert agent.road_graph is agent.bundle.road_graph()
+    assert np.array_equal(agent.road_graph.cell_keys, graph.cell_keys)
+    assert agent.road_graph.nearest_node(46.59, -121.41)[0] == 1
@@ -0,0 +1,93 @@
+import threading
+import pytest
+from sar_project.agents.orchestrator import IncidentOrchestrator
+from sar_project.agents.weather_agent import WeatherAgent
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+
+
+# Agent that waits for a barrier (to prove it ran alongside others) or an event
+# (to stay busy past the deadline), then echoes what it saw in the shared state.
+class BlockingAgent:
+    def __init__(self, barrier=None, release=None, fail=False):
+        self.barrier = barrier
+        self.release = release
+        self.fail = fail
+        self.kb = None
+
+    def process_request(self, message):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        if self.fail:
+            return {"error": "agent failed"}
+        return {"message": message, "lat": self.kb.lat if self.kb else None}
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+@pytest.fixture
+def orchestrator(release):
+    # medical and logistics only get past the barrier if they run at the same time
+    barrier = threading.Barrier(2)
+    orchestrator = IncidentOrchestrator({
+        "weather": WeatherAgent(),
+        "medical": BlockingAgent(barrier=barrier),
+        "logistics": BlockingAgent(barrier=barrier),
+        "drones": BlockingAgent(release=release),
+        "broken": BlockingAgent(fail=True),
+    })
+    yield orchestrator
+    orchestrator.shutdown()
+
+
+def test_agents_run_in_parallel(orchestrator):
+    kb = KnowledgeBase("incident-1")
+    kb.lat = 45.0
+    response = orchestrator.handle({
+        "weather": {"get_conditions": True, "location": "test_location"},
+        "medical": "Patient has a head injury",
+        "logistics": "Closest landing zone?",
+    }, knowledge_base=kb)
+
+    assert response["complete"]
+    assert response["results"]["weather"]["temperature"] == 22
+    assert response["results"]["medical"] == {"message": "Patient has a head injury", "lat": 45.0}
+    assert response["results"]["logistics"]["message"] == "Closest landing zone?"
+
+
+def test_partial_results_after_deadline(orchestrator):
+    response = orchestrator.handle({"weather": {"get_conditions": True, "location": "test_location"},
+                                    "drones": "Scan sector 4", "broken": "Hi"}, deadline=0.5)
+
+    assert not response["complete"]
+    assert response["timed_out"] == ["drones"]
+    assert response["errors"] == {"broken": "agent failed"}
+    assert "weather" in response["results"]
+
+
+def test_overrunning_agents_leave_capacity_for_later_incidents(orchestrator, release):
+    for _ in range(3):
+        assert orchestrator.handle({"drones": "Scan"}, deadline=0.05)["timed_out"] == ["drones"]
+    assert orchestrator.stragglers == 3
+
+    # Three drones are still holding workers; medical and logistics need two more at once
+    response = orchestrator.handle({"medical": "Status?", "logistics": "Fuel?"}, deadline=5)
+    assert response["complete"]
+
+    release.set()
+    orchestrator.shutdown()
+    orchestrator.executor.shutdown(wait=True)
+    assert orchestrator.stragglers == 0
+
+
+def test_statuses():
+    orchestrator = IncidentOrchestrator({"weather": WeatherAgent()})
+    orchestrator.update_statuses("active")
+    assert orchestrator.get_statuses() == {"weather": "active"}
+    orchestrator.shutdown()
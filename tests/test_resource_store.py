@@ -0,0 +1,65 @@
+import asyncio
+from sar_project.knowledge import KnowledgeBase, ResourceStore
+
+
+def test_versioned_updates_and_field_subscriptions():
+    kb = KnowledgeBase()
+    battery_changes, all_changes = [], []
+    kb.subscribe_resource_changes(battery_changes.append, resources=["drone-1"], fields=["battery"])
+    subscription = kb.subscribe_resource_changes(all_changes.append)
+
+    kb.update_resource_status("drone-1", {"battery": 90, "altitude": 100})
+    kb.update_resource_statuses([
+        ("drone-1", {"battery": 90, "altitude": 120}),
+        ("drone-2", {"battery": 50}),
+        ("drone-1", {"battery": 90, "altitude": 120}),
+    ])
+    subscription.cancel()
+    kb.update_resource_status("drone-1", {"battery": 85, "altitude": 120})
+
+    assert kb.query_resource_status("drone-1") == {"battery": 85, "altitude": 120}
+    assert kb.query_resource_status("truck-9") == {}
+    assert kb.resource_status.version("drone-1") == 3
+    assert [change.status["battery"] for change in battery_changes] == [90, 85]
+    assert [(change.resource, change.changed) for change in all_changes] == [
+        ("drone-1", {"battery", "altitude"}), ("drone-1", {"altitude"}), ("drone-2", {"battery"})]
+
+
+def test_returned_statuses_are_copies():
+    store = ResourceStore()
+    changes = []
+    store.subscribe(changes.append)
+    store.update("drone-1", {"battery": 90})
+
+    store.get("drone-1")["battery"] = 0
+    store["drone-1"]["battery"] = 0
+    store.history("drone-1")[0][1]["battery"] = 0
+    changes[0].status["battery"] = 0
+
+    assert store.get("drone-1") == {"battery": 90}
+    assert store.version("drone-1") == 1
+
+
+def test_history_is_downsampled():
+    store = ResourceStore(recent_size=5, downsample_interval=60)
+    store.update_many([("drone-1", {"altitude": i}, 1000.0 + i) for i in range(600)])
+
+    history = store.history("drone-1")
+    assert len(history) == 11 + 5
+    assert history[-1] == (1599.0, {"altitude": 599})
+    assert [timestamp for timestamp, _ in history] == sorted(timestamp for timestamp, _ in history)
+
+
+def test_async_watch():
+    store = ResourceStore()
+
+    async def main():
+        watch = store.watch(resources=["truck-1"])
+        store.update("truck-1", {"fuel": 0.5})
+        store.update("truck-2", {"fuel": 0.9})
+        store.update("truck-1", {"fuel": 0.4})
+        received = [await watch.__anext__(), await watch.__anext__()]
+        watch.close()
+        return received
+
+    assert [change.status["fuel"] for change in asyncio.run(main())] == [0.5, 0.4]
@@ -0,0 +1,149 @@
+import math
+import numpy as np
+import pytest
+import requests
+from sar_project.agents.first_aid_agent import FirstAidAgent
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+from sar_project.knowledge import road_network
+from sar_project.knowledge.road_network import RoadGraph
+
+# Base camp at node 1. The clinic at node 4 is closer in a straight line but only
+# reachable by a long mountain track; the hospital at node 5 is on a fast one-way road.
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="46.00" lon="-121.00"/>
+  <node id="2" lat="46.05" lon="-121.00"/>
+  <node id="3" lat="46.05" lon="-120.95"/>
+  <node id="4" lat="46.00" lon="-120.95"/>
+  <node id="5" lat="46.00" lon="-121.10"/>
+  <node id="6" lat="46.30" lon="-121.30"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/><tag k="highway" v="track"/></way>
+  <way id="11"><nd ref="1"/><nd ref="5"/><tag k="highway" v="primary"/><tag k="maxspeed" v="100"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="5"/><nd ref="6"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+
+
+@pytest.fixture
+def graph(tmp_path):
+    path = tmp_path / "area.osm"
+    path.write_text(OSM)
+    return RoadGraph.from_osm(str(path))
+
+
+def test_builds_csr_from_drivable_ways(graph):
+    assert len(graph) == 5
+    # Track segments both ways plus the one-way primary road
+    assert len(graph.targets) == 7
+    assert graph.indptr[-1] == len(graph.targets)
+
+
+def test_route_respects_one_way(graph):
+    base_camp, _ = graph.nearest_node(46.0, -121.0)
+    far, _ = graph.nearest_node(46.0, -121.1)
+
+    seconds, path = graph.route(base_camp, far)
+    assert path == [base_camp, far]
+    assert seconds == pytest.approx(7.73 / 100 * 3600, rel=0.01)
+    assert graph.route(far, base_camp) == (math.inf, [])
+
+
+def test_snapping_matches_brute_force_and_loads_prebuilt_index(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    nodes = {i: (46.0 + lat, -121.0 + lon) for i, (lat, lon) in enumerate(rng.uniform(0, 0.2, (500, 2)))}
+    graph = RoadGraph.from_edges(nodes, [])
+    graph.save(str(tmp_path / "graph.npz"))
+
+    # Loading a saved graph must reuse its index instead of rebuilding it
+    monkeypatch.setattr(road_network, "_cell_index", lambda lat, lon: pytest.fail("index rebuilt on load"))
+    loaded = RoadGraph.load(str(tmp_path / "graph.npz"))
+    assert np.array_equal(loaded.cell_keys, graph.cell_keys)
+
+    coords = np.array(list(nodes.values()))
+    for lat, lon in [(46.1, -120.9), (46.0, -121.0), (46.5, -120.5), (45.0, -121.1)]:
+        node, distance = loaded.nearest_node(lat, lon)
+        brute = road_network._haversine_km(lat, lon, coords[:, 0], coords[:, 1])
+        assert node == int(np.argmin(brute))
+        assert distance == pytest.approx(brute.min())
+
+
+def test_ranks_by_travel_time_not_distance(graph, tmp_path):
+    graph.save(str(tmp_path / "graph.npz"))
+    loaded = RoadGraph.load(str(tmp_path / "graph.npz"))
+    candidates = [("Mountain Clinic", 46.0, -120.95, 3.9), ("Valley Hospital", 46.0, -121.1, 7.7)]
+
+    ranked = loaded.rank_by_travel_time(46.0, -121.0, candidates)
+    assert [candidate[0] for _, candidate in ranked] == ["Valley Hospital", "Mountain Clinic"]
+    assert ranked[0][0] < ranked[1][0] / 5
+
+
+def test_empty_graph_falls_back_to_straight_line(tmp_path, monkeypatch):
+    path = tmp_path / "empty.osm"
+    path.write_text('<?xml version="1.0"?><osm version="0.6"><node id="1" lat="46.0" lon="-121.0"/></osm>')
+    graph = RoadGraph.from_osm(str(path))
+    assert len(graph) == 0
+    assert graph.nearest_node(46.0, -121.0) is None
+    assert graph.route_coordinates((46.0, -121.0), (46.0, -121.1)) is None
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"elements": [{"type": "node", "lat": 46.0, "lon": -121.1, "tags": {"name": "Valley Hospital"}}]}
+
+    monkeypatch.setattr(requests, "get", lambda url, params: FakeResponse())
+    kb = KnowledgeBase("empty-graph")
+    agent = FirstAidAgent(knowledge_base=kb, road_graph=graph)
+    monkeypatch.setattr(agent, "get_weather_conditions", lambda: "Clear")
+    agent.update_location(46.0, -121.0)
+
+    assert "Travel time" not in kb.nearest_hospital
+    assert agent.build_map().layers["routes"]["hospital"] == [[46.0, -121.0], [46.0, -121.1]]
+
+
+def test_agent_picks_fastest_hospital(graph, monkeypatch):
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"elements": [
+                {"type": "node", "lat": 46.0, "lon": -120.95, "tags": {"name": "Mountain Clinic"}},
+                {"type": "node", "lat": 46.0, "lon": -121.1, "tags": {"name": "Valley Hospital"}},
+            ]}
+
+    monkeypatch.setattr(requests, "get", lambda url, params: FakeResponse())
+    kb = KnowledgeBase("route-test")
+    kb.lat, kb.lon = 46.0, -121.0
+    agent = FirstAidAgent(knowledge_base=kb, road_graph=graph)
+
+    hospital, location = agent.find_nearest_hospital()
+    assert hospital.startswith("Valley Hospital, Location: 46.0, -121.1")
+    assert "Travel time: 5 min by road" in hospital
+    assert location == (46.0, -121.1)
+
+
+def test_road_ranking_considers_nearest_candidates(monkeypatch):
+    # Overpass results arrive farthest first; only the 10 closest should reach the router
+    elements = [{"type": "node", "lat": 46.0 + i * 0.01, "lon": -121.0, "tags": {"name": f"Hospital {i}"}}
+                for i in reversed(range(15))]
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"elements": elements}
+
+    class RecordingGraph:
+        def rank_by_travel_time(self, lat, lon, candidates):
+            self.candidates = [candidate[0] for candidate in candidates]
+            return [(600.0, candidates[-1])]
+
+    monkeypatch.setattr(requests, "get", lambda url, params: FakeResponse())
+    kb = KnowledgeBase("candidates")
+    kb.lat, kb.lon = 46.0, -121.0
+    graph = RecordingGraph()
+    agent = FirstAidAgent(knowledge_base=kb, road_graph=graph)
+
+    hospital = agent.get_nearest_hospital()
+    assert sorted(graph.candidates) == sorted(f"Hospital {i}" for i in range(10))
+    assert "Travel time: 10 min by road" in hospital
@@ -0,0 +1,234 @@
+import asyncio
+import copy
+import threading
+import pstats
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from sar_project.agents.service import FirstAidService
+from sar_project.knowledge.session_manager import SessionManager
+
+
+# Stands in for FirstAidAgent so no Gemini, Overpass or Open-Meteo calls are made.
+class DummyAgent:
+    def __init__(self):
+        self.kb = None
+
+    def bind(self, knowledge_base):
+        session_agent = copy.copy(self)
+        session_agent.kb = knowledge_base
+        return session_agent
+
+    def update_location(self, lat, lon):
+        self.kb.lat, self.kb.lon = float(lat), float(lon)
+        self.kb.weather = "Temperature: 10°C"
+        self.kb.nearest_hospital = "Test Hospital, Location: 12.35, 56.79 (Distance: 1.00 km)"
+        self.kb.hospital_location = (12.35, 56.79)
+        return {"weather": self.kb.weather, "nearest_hospital": self.kb.nearest_hospital,
+                "hospital_location": self.kb.hospital_location}
+
+    def update_user_data(self, message, lat, lon):
+        self.kb.chat_history.append(message)
+
+    def summarize_chat_history(self):
+        pass
+
+    def fast_answer(self, message):
+        return "Push hard and fast." if message == "CPR rate?" else None
+
+    def generate_prompt(self, message):
+        return message
+
+    def stream_gemini(self, prompt):
+        yield "Apply "
+        yield "pressure."
+
+
+@pytest.fixture
+def service():
+    return FirstAidService(agent=DummyAgent(), sessions=SessionManager(), max_workers=2, embed_workers=1)
+
+
+def run(service, scenario):
+    async def main():
+        async with TestClient(TestServer(service.create_app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_chat_streams_response_per_session(service):
+    async def scenario(client):
+        await client.post("/sessions/team-a/location", json={"lat": 12.34, "lon": 56.78})
+        response = await client.post("/sessions/team-a/chat", json={"message": "Patient is bleeding"})
+        refused = await client.post("/sessions/team-b/chat", json={"message": "Hello"})
+        return response.status, await response.text(), refused.status
+
+    status, text, refused_status = run(service, scenario)
+    assert status == 200
+    assert text == "Apply pressure."
+    assert refused_status == 409
+    assert service.sessions.get("team-a").chat_history == ["Patient is bleeding"]
+    assert service.sessions.get("team-b").chat_history == []
+
+
+def test_protocol_questions_use_fast_path(service, monkeypatch):
+    release = threading.Event()
+    update_user_data = DummyAgent.update_user_data
+
+    def slow_update(self, message, lat, lon):
+        assert release.wait(5)
+        update_user_data(self, message, lat, lon)
+
+    monkeypatch.setattr(DummyAgent, "update_user_data", slow_update)
+
+    async def scenario(client):
+        await client.post("/sessions/team-a/location", json={"lat": 12.34, "lon": 56.78})
+        response = await client.post("/sessions/team-a/chat", json={"message": "CPR rate?"})
+        # The answer arrives while the update is still blocked
+        answer = await asyncio.wait_for(response.content.readany(), 2)
+        history = list(service.sessions.get("team-a").chat_history)
+        release.set()
+        rest = await response.content.read()
+        return answer, history, rest
+
+    answer, history, rest = run(service, scenario)
+    assert answer == b"Push hard and fast."
+    assert history == []
+    assert rest == b""
+    # The message still goes through update_user_data before the turn ends
+    assert service.sessions.get("team-a").chat_history == ["CPR rate?"]
+
+
+def test_profiled_chat_writes_a_profile(service, tmp_path):
+    service.profile_dir = str(tmp_path)
+
+    async def scenario(client):
+        await client.post("/sessions/team-a/location", json={"lat": 12.34, "lon": 56.78})
+        rejected = await client.post("/sessions/team-a/profile", json={"enabled": True, "output_dir": "/tmp"})
+        enabled = await client.post("/sessions/team-a/profile", json={"enabled": True})
+        await (await client.post("/sessions/team-a/chat", json={"message": "Patient is bleeding"})).text()
+        await client.post("/sessions/team-a/profile", json={"enabled": False})
+        return rejected.status, enabled.status
+
+    assert run(service, scenario) == (400, 200)
+    profiles = list(tmp_path.glob("team-a-chat_turn-*.prof"))
+    assert len(profiles) == 1
+    stats = pstats.Stats(str(profiles[0]))
+    # The Gemini stream runs in a worker thread and still shows up in the turn's profile
+    assert any(function == "stream_gemini" for _, _, function in stats.stats)
+
+
+def test_concurrently_profiled_sessions_do_not_overlap(service, tmp_path):
+    service.profile_dir = str(tmp_path)
+    active, overlaps = [], []
+    lock = threading.Lock()
+
+    def stream_gemini(prompt):
+        with lock:
+            active.append(prompt)
+            overlaps.append(len(active))
+        threading.Event().wait(0.05)
+        with lock:
+            active.remove(prompt)
+        yield "Apply pressure."
+
+    service.agent.stream_gemini = stream_gemini
+
+    async def scenario(client):
+        for team in ("team-a", "team-b"):
+            await client.post(f"/sessions/{team}/location", json={"lat": 1, "lon": 2})
+            await client.post(f"/sessions/{team}/profile", json={"enabled": True})
+
+        async def chat(team):
+            return await (await client.post(f"/sessions/{team}/chat", json={"message": team})).text()
+
+        texts = await asyncio.gather(chat("team-a"), chat("team-b"))
+        for team in ("team-a", "team-b"):
+            await client.post(f"/sessions/{team}/profile", json={"enabled": False})
+        return texts
+
+    assert run(service, scenario) == ["Apply pressure."] * 2
+    # Two IO workers were free, but only one profiled stream ran at a time
+    assert overlaps == [1, 1]
+    assert len(list(tmp_path.glob("team-a-chat_turn-*.prof"))) == 1
+    assert len(list(tmp_path.glob("team-b-chat_turn-*.prof"))) == 1
+
+
+def test_websocket_rejects_malformed_frames(service):
+    async def scenario(client):
+        ws = await client.ws_connect("/sessions/team-a/ws")
+        replies = []
+        for frame in ("not json", "[1, 2]", '{"type": "location", "lat": "north"}',
+                      '{"type": "location"}', '{"type": "chat"}'):
+            await ws.send_str(frame)
+            replies.append(await ws.receive_json())
+        await ws.send_json({"type": "location", "lat": 1, "lon": 2})
+        replies.append(await ws.receive_json())
+        await ws.close()
+        return replies
+
+    replies = run(service, scenario)
+    assert [reply["type"] for reply in replies] == ["error"] * 5 + ["location"]
+    assert replies[2]["error"] == "Expected numeric 'lat' and 'lon'"
+    assert replies[4]["error"] == "Missing 'message'"
+
+
+def test_http_rejects_malformed_bodies(service):
+    async def scenario(client):
+        bad_json = await client.post("/sessions/team-a/location", data="lat=1",
+                                      headers={"Content-Type": "application/json"})
+        bad_lat = await client.post("/sessions/team-a/chat", json={"message": "Hi", "lat": "x", "lon": 2})
+        return bad_json.status, bad_lat.status
+
+    assert run(service, scenario) == (400, 400)
+
+
+def test_requests_over_the_limit_are_rejected(service):
+    service.max_in_flight = 0
+
+    async def scenario(client):
+        busy = await client.post("/sessions/team-a/location", json={"lat": 1, "lon": 2})
+        status = await (await client.get("/status")).json()
+        return busy.status, status
+
+    busy_status, status = run(service, scenario)
+    assert busy_status == 503
+    assert status["rejected"] == 1
+
+
+def test_websockets_are_counted_per_message(service):
+    service.max_in_flight = 1
+
+    async def scenario(client):
+        ws = await client.ws_connect("/sessions/team-a/ws")
+        # An idle socket holds no slot, so plain requests still get through
+        location = await client.post("/sessions/team-b/location", json={"lat": 1, "lon": 2})
+        await ws.send_json({"type": "location", "lat": 1, "lon": 2})
+        reply = await ws.receive_json()
+        service.max_in_flight = 0
+        await ws.send_json({"type": "location", "lat": 1, "lon": 2})
+        busy = await ws.receive_json()
+        await ws.close()
+        return location.status, reply, busy
+
+    status, reply, busy = run(service, scenario)
+    assert status == 200
+    assert reply["type"] == "location"
+    assert busy == {"type": "error", "error": "Service busy, retry shortly"}
+    assert service.in_flight == 0
+
+
+def test_sessions_load_off_the_event_loop(service):
+    threads = []
+    get = service.sessions.get
+
+    def recording_get(session_id):
+        threads.append(threading.current_thread())
+        return get(session_id)
+
+    service.sessions.get = recording_get
+
+    async def scenario(client):
+        return (await client.post("/sessions/team-a/location", json={"lat": 1, "lon": 2})).status
+
+    assert run(service, scenario) == 200
+    assert threads and threading.main_thread() not in threads
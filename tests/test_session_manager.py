@@ -0,0 +1,49 @@
+import pytest
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+from sar_project.knowledge.session_manager import SessionManager
+
+
+@pytest.fixture
+def manager():
+    return SessionManager(max_sessions=3, idle_timeout=60)
+
+
+def test_sessions_are_isolated(manager):
+    team_a = manager.get("team-a")
+    team_b = manager.get("team-b")
+    team_a.chat_history.append("Patient has a broken leg")
+    team_a.lat, team_a.lon = 45.0, -121.0
+
+    assert isinstance(team_a, KnowledgeBase)
+    assert manager.get("team-a") is team_a
+    assert team_b.chat_history == []
+    assert not team_b.has_location()
+
+
+def test_least_recently_used_session_is_evicted(manager):
+    evicted = []
+    manager.on_evict = evicted.append
+    for session_id in ("a", "b", "c"):
+        manager.get(session_id)
+    manager.get("a")
+    manager.get("d")
+
+    assert [state.session_id for state in evicted] == ["b"]
+    assert manager.session_ids() == ["c", "a", "d"]
+
+
+def test_idle_sessions_are_evicted(manager):
+    stale = manager.get("stale")
+    fresh = manager.get("fresh")
+    stale.last_active -= 120
+
+    # "stale" was accessed first, so it is at the front of the eviction order
+    assert manager.evict_idle(now=fresh.last_active) == ["stale"]
+    assert "stale" not in manager
+    assert "fresh" in manager
+
+
+def test_state_objects_use_slots():
+    state = KnowledgeBase("slot-check")
+    with pytest.raises(AttributeError):
+        state.unexpected = True
@@ -0,0 +1,56 @@
+import pytest
+from sar_project.knowledge.knowledge_base_firstaid import KnowledgeBase
+from sar_project.knowledge.session_manager import SessionManager
+from sar_project.knowledge.session_store import SessionStore, apply_turn
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"), snapshot_every=3)
+    yield store
+    store.close()
+
+
+def chat(store, state, message):
+    turn = {"message": message, "data": {"rescuee_condition": message}}
+    apply_turn(state, "message", turn)
+    store.append_turn(state, "message", turn)
+
+
+def test_resume_replays_turns_after_snapshot(store):
+    state = KnowledgeBase("team-a")
+    location = {"lat": 45.0, "lon": -121.0, "weather": "Clear", "nearest_hospital": "Test Hospital",
+                "hospital_location": [45.1, -121.2]}
+    apply_turn(state, "location", location)
+    store.append_turn(state, "location", location)
+    for i in range(4):
+        chat(store, state, f"Message {i}")
+
+    restored = store.load("team-a")
+    assert restored.to_dict() == state.to_dict()
+    assert restored.hospital_location == (45.1, -121.2)
+    assert store.load("unknown") is None
+
+
+def test_summary_turn_replaces_history(store):
+    state = KnowledgeBase("team-a")
+    chat(store, state, "Patient is cold")
+    turn = {"message": "Patient is shivering", "data": state.data, "summary": "Hypothermic patient"}
+    apply_turn(state, "message", turn)
+    store.append_turn(state, "message", turn)
+
+    assert store.load("team-a").chat_history == ["Hypothermic patient"]
+
+
+def test_session_manager_resumes_from_store(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    manager = SessionManager(store=SessionStore(path))
+    state = manager.get("team-a")
+    turn = {"message": "Broken ankle", "data": {"rescuee_condition": "Broken ankle"}}
+    apply_turn(state, "message", turn)
+    manager.record(state, "message", turn)
+    manager.remove("team-a")
+
+    # A fresh manager (e.g. after a restart) resumes the session
+    restarted = SessionManager(store=SessionStore(path))
+    assert restarted.get("team-a").chat_history == ["Broken ankle"]
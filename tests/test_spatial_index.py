@@ -0,0 +1,50 @@
+import random
+import pytest
+from sar_project.knowledge import KnowledgeBase, SpatialIndex
+from sar_project.knowledge.spatial_index import haversine_km
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(7)
+    return {f"p{i}": (44.0 + rng.random(), -122.0 + rng.random()) for i in range(2000)}
+
+
+@pytest.fixture
+def index(points):
+    index = SpatialIndex(cell_size=0.02)
+    for key, (lat, lon) in points.items():
+        index.insert(key, lat, lon)
+    return index
+
+
+def test_nearest_matches_brute_force(index, points):
+    for lat, lon in [(44.5, -121.5), (43.9, -122.1), (44.99, -121.01)]:
+        expected = sorted(points, key=lambda key: haversine_km(lat, lon, *points[key]))[:5]
+        assert [key for _, key in index.nearest(lat, lon, k=5)] == expected
+
+
+def test_bbox_and_corridor(index, points):
+    inside = index.within_bbox(44.2, -121.8, 44.4, -121.6)
+    assert sorted(inside) == sorted(key for key, (lat, lon) in points.items()
+                                    if 44.2 <= lat <= 44.4 and -121.8 <= lon <= -121.6)
+
+    corridor = index.along_corridor([(44.1, -121.9), (44.9, -121.1)], width_km=1.0)
+    assert corridor
+    assert all(distance <= 1.0 for distance, _ in corridor)
+    assert [distance for distance, _ in corridor] == sorted(distance for distance, _ in corridor)
+
+
+def test_knowledge_base_spatial_queries():
+    kb = KnowledgeBase()
+    kb.update_weather("44.50,-121.50", {"wind_speed": 40})
+    kb.update_weather((44.60, -121.40), {"wind_speed": 10})
+    kb.update_weather("Base Camp", {"wind_speed": 5})
+
+    nearest = kb.query_weather_nearest(44.51, -121.49)
+    assert nearest[0]["location"] == "44.50,-121.50"
+    assert nearest[0]["data"] == {"wind_speed": 40}
+    assert kb.query_weather_area(44.55, -121.45, 44.65, -121.35) == {(44.60, -121.40): {"wind_speed": 10}}
+    assert list(kb.query_weather_corridor([(44.5, -121.5), (44.6, -121.4)], width_km=0.5)) == [
+        "44.50,-121.50", (44.60, -121.40)]
+    assert kb.query_weather("Base Camp") == {"wind_speed": 5}
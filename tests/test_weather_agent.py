@@ -1,4 +1,8 @@
+import time
+import numpy as np
 import pytest
+import requests
+from sar_project.agents import weather_risk
 from sar_project.agents.weather_agent import WeatherAgent
 
 class TestWeatherAgent:
@@ -30,3 +34,105 @@ class TestWeatherAgent:
         response = agent.update_status("active")
         assert response["new_status"] == "active"
         assert agent.get_status() == "active"
+
+    def test_area_risk_uses_one_request_and_forecast(self, agent, monkeypatch):
+        calls = []
+
+        def fake_get(url, params, timeout):
+            calls.append(params)
+
+            class FakeResponse:
+                def raise_for_status(self):
+                    pass
+
+                def json(self):
+                    return [
+                        {"current": {"wind_speed_10m": 10, "visibility": 20000},
+                         "hourly": {"wind_speed_10m": [12, 45], "visibility": [20000, 20000]}},
+                        {"current": {"wind_speed_10m": 5, "visibility": 2000},
+                         "hourly": {"wind_speed_10m": [5, 5], "visibility": [9000, 9000]}},
+                        {"current": {"wind_speed_10m": 5, "visibility": 20000},
+                         "hourly": {"wind_speed_10m": [5, 5], "visibility": [20000, 20000]}},
+                    ]
+
+            return FakeResponse()
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        response = agent.process_request({
+            "assess_area_risk": True,
+            "locations": [(45.0, -121.0), (45.1, -121.1), (45.2, -121.2)],
+        })
+
+        assert len(calls) == 1
+        assert calls[0]["latitude"] == "45.0000,45.1000,45.2000"
+        cells = response["locations"]
+        assert cells[0]["risks"] == ["high_wind"]
+        assert cells[0]["first_risk_hour"] == 2
+        assert cells[1]["risks"] == ["low_visibility"]
+        assert cells[2]["risk_level"] == 0
+        assert response["max_risk_level"] == 1
+
+    def test_fetch_reports_forecast_start_and_weather_code(self, monkeypatch):
+        class FakeResponse:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"utc_offset_seconds": 0,
+                        "current": {"time": "2024-05-01T12:20", "weather_code": 3},
+                        "hourly": {"time": ["2024-05-01T12:00", "2024-05-01T13:00"], "weather_code": [3, 61]}}
+
+        monkeypatch.setattr(requests, "get", lambda url, params, timeout: FakeResponse())
+        conditions = weather_risk.fetch_conditions([(45.0, -121.0)])
+
+        assert conditions.start_time == 1714564800.0
+        assert conditions.weather_code.tolist() == [[3.0, 3.0, 61.0]]
+        assert np.isnan(conditions.wind_speed).all()
+
+    def test_repeated_requests_are_cached(self, agent, monkeypatch):
+        calls = []
+        original = agent.get_current_conditions
+        monkeypatch.setattr(agent, "get_current_conditions", lambda location: calls.append(location) or original(location))
+
+        first = agent.process_request({"get_conditions": True, "location": "test_location"})
+        agent.process_request({"get_conditions": True, "location": "test_location"})
+        agent.process_request({"assess_risk": True, "location": "test_location"})
+        agent.process_request({"assess_risk": True, "location": "test_location"})
+
+        assert calls == ["test_location"]
+        assert first["temperature"] == 22
+
+    def test_risk_tiles_serve_coordinates_in_operation_area(self, agent, monkeypatch):
+        def fake_fetch(points, hours):
+            wind = np.array([[40.0 if lat > 45.5 else 10.0] * (hours + 1) for lat, _ in points])
+            return weather_risk.ConditionsGrid(points, wind, np.full(wind.shape, 20.0),
+                                               np.zeros(wind.shape), np.zeros(wind.shape))
+
+        monkeypatch.setattr(weather_risk, "fetch_conditions", fake_fetch)
+        tiles = agent.set_operation_area(45.0, -122.0, 46.0, -121.0, rows=3, cols=3, refresh_interval=3600)
+        deadline = time.monotonic() + 5
+        while tiles.tiles is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        inside = agent.process_request({"assess_risk": True, "location": (45.9, -121.5)})
+        outside = agent.process_request({"assess_risk": True, "location": "test_location"})
+        assert inside == {"risk_level": 1, "risks": ["high_wind"], "recommendations": ["Secure loose equipment"]}
+        assert inside.keys() == outside.keys()
+        assert agent.process_request({"assess_risk": True, "location": "45.1,-121.9"})["risk_level"] == 0
+
+        # Answers are copies, so changing one leaves the tiles and the cache intact
+        inside["risks"].clear()
+        outside["risk_level"] = 5
+        assert agent.risk_at((45.9, -121.5))["risks"] == ["high_wind"]
+        assert agent.risk_at("test_location")["risk_level"] == 0
+        agent.clear_operation_area()
+
+    def test_tile_risk_reports_current_conditions(self, agent):
+        # Wind picks up only in the last forecast hour
+        wind = np.array([[10.0, 10.0, 40.0]])
+        conditions = weather_risk.ConditionsGrid([(45.0, -121.0)], wind, np.full(wind.shape, 20.0),
+                                                 np.zeros(wind.shape), np.zeros(wind.shape))
+        cell = agent._risk_grid(conditions)["locations"][0]
+        assert cell["risks"] == ["high_wind"]
+        assert cell["first_risk_hour"] == 2
+        assert cell["current_risks"] == []